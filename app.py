@@ -5,7 +5,16 @@ This file implements the frontend of the payroll-processing web app.
 '''
 #import pacakges
 import os
-from flask import Flask, render_template, request, send_file, redirect, jsonify
+import functools
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import multiprocessing
+import queue
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from flask import Flask, render_template, request, send_from_directory, redirect, jsonify, Response, stream_with_context
 from helpers import *
 import time
 from werkzeug.utils import secure_filename
@@ -13,38 +22,93 @@ from werkzeug.utils import secure_filename
 #initialize app
 app = Flask(__name__)
 
-# Configure the app to store files
-app.config['SHIFT_RECORD_FOLDER'] = 'shift_record'
-app.config['OLD_TRACKER_FOLDER'] = 'old_tracker'
-app.config['PROCESSED_FILES_FOLDER'] = 'processed_files'
+#folders and paths of the stored files
+SHIFT_RECORD_FOLDER = 'shift_record'
+OLD_TRACKER_FOLDER = 'old_tracker'
+PROCESSED_FILES_FOLDER = 'processed_files'
+SHIFT_RECORD_PATH = os.path.join(SHIFT_RECORD_FOLDER, 'shift_record.xlsx')
+OLD_TRACKER_PATH = os.path.join(OLD_TRACKER_FOLDER, 'old_tracker.xlsx')
 
 #allowed extension
-app.config['ALLOWED_EXTENSIONS'] = {'xlsx'}
+ALLOWED_EXTENSIONS = frozenset({'xlsx'})
+
+# Configure the app to store files
+app.config['SHIFT_RECORD_FOLDER'] = SHIFT_RECORD_FOLDER
+app.config['OLD_TRACKER_FOLDER'] = OLD_TRACKER_FOLDER
+app.config['PROCESSED_FILES_FOLDER'] = PROCESSED_FILES_FOLDER
+app.config['ALLOWED_EXTENSIONS'] = ALLOWED_EXTENSIONS
+#reject uploads larger than 200 MB
+app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024
+#copy uploads to disk in 1 MB chunks
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
+#let a fronting web server (X-Sendfile) stream downloads from disk, set USE_X_SENDFILE=1 to enable
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
 
 shift_record_file_name = ''
 tracker_file_name = ''
 
+#progress queues of the running processing jobs, keyed by job id
+JOBS = {}
+#worker task pool: the CPU-bound payroll pipelines run in their own processes,
+#so uploads and downloads stay responsive on Flask's threads while a job runs
+WTP = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2)//2))
+_manager = None
+_manager_lock = threading.Lock()
+#seconds between keep-alive comments on an idle progress stream
+SSE_HEARTBEAT_SECONDS = 15
+#folders are emptied in the background so requests do not wait on the deletes
+PURGE_POOL = ThreadPoolExecutor(max_workers=3)
+PURGES = {}
+#names for the dropdown, kept until either upload changes
+NAMES_CACHE = {'version': None, 'names': []}
+#stage timings of finished jobs go to perf.log
+PERF_LOG = logging.getLogger('nova.perf')
+PERF_LOG.setLevel(logging.INFO)
+PERF_LOG.propagate = False
+_perf_handler = RotatingFileHandler('perf.log', maxBytes=1024 * 1024, backupCount=3)
+_perf_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+PERF_LOG.addHandler(_perf_handler)
+
 #check if the file names has the extension required
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+    dot = filename.rfind('.')
+    return dot >= 0 and filename[dot + 1:].lower() in ALLOWED_EXTENSIONS
+
+#check that an upload starts with the zip signature every .xlsx file has
+def is_xlsx(file):
+    head = file.stream.read(4)
+    file.stream.seek(0)
+    return head == b'PK\x03\x04'
 
 # render index.html
 @app.route('/')
 def index():
-    shift_record_present = os.path.exists(os.path.join(app.config['SHIFT_RECORD_FOLDER'], 'shift_record.xlsx'))
-    old_tracker_present = os.path.exists(os.path.join(app.config['OLD_TRACKER_FOLDER'], 'old_tracker.xlsx'))
+    shift_record_present = os.path.exists(SHIFT_RECORD_PATH)
+    old_tracker_present = os.path.exists(OLD_TRACKER_PATH)
     return render_template('index.html', shift_record_present=shift_record_present, old_tracker_present=old_tracker_present, names=[])
 
+#empty folders in the background
+def _purge_later(*folders):
+    for folder in folders:
+        PURGES[folder] = PURGE_POOL.submit(delete_files_in_folder, folder)
+
+#block until a pending purge of the folder has finished, so new files are not deleted with the old ones
+def _wait_for_purge(folder):
+    pending = PURGES.get(folder)
+    if pending is not None:
+        pending.result()
+
 #upload shift record
 @app.route('/shift_record', methods=['POST'])
 def upload_shift_record():
     global shift_record_file_name
-    delete_files_in_folder("./processed_files")
+    _purge_later(PROCESSED_FILES_FOLDER)
     file = request.files['shift_record']
     shift_record_file_name = secure_filename(file.filename)  
-    if file and allowed_file(file.filename):
-        filename = 'shift_record.xlsx'
-        file.save(os.path.join(app.config['SHIFT_RECORD_FOLDER'], filename))
+    if file and allowed_file(file.filename) and is_xlsx(file):
+        _wait_for_purge(SHIFT_RECORD_FOLDER)
+        file.save(SHIFT_RECORD_PATH, buffer_size=UPLOAD_BUFFER_SIZE)
         return "Shift record uploaded successfully."
 
     # Handle invalid file or file type
@@ -54,17 +118,62 @@ def upload_shift_record():
 @app.route('/old_tracker', methods=['POST'])
 def upload_tracker():
     global tracker_file_name
-    delete_files_in_folder("./processed_files")
+    _purge_later(PROCESSED_FILES_FOLDER)
     file = request.files['old_tracker']
     tracker_file_name = secure_filename(file.filename)  
-    if file and allowed_file(file.filename):
-        filename = 'old_tracker.xlsx'
-        file.save(os.path.join(app.config['OLD_TRACKER_FOLDER'], filename))
+    if file and allowed_file(file.filename) and is_xlsx(file):
+        _wait_for_purge(OLD_TRACKER_FOLDER)
+        file.save(OLD_TRACKER_PATH, buffer_size=UPLOAD_BUFFER_SIZE)
         return "Old tracker uploaded successfully."
 
     # Handle invalid file or file type
     return "Invalid file or file type."
 
+#progress queue shared with the worker processes; the manager is started on first use
+def _job_queue():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = multiprocessing.Manager()
+    return _manager.Queue()
+
+#push the outcome of a finished pipeline to the job's queue
+def _finish_job(job_id, job_queue, future):
+    try:
+        result = future.result()
+    except Exception as e:
+        # display error
+        result = {"status": "error", "message": str(e)}
+    if "timings" in result:
+        PERF_LOG.info("%s %s", job_id, json.dumps(result["timings"]))
+    result.update({"stage": "done", "pct": 100})
+    job_queue.put(result)
+
+#register a job and hand the pipeline to the worker task pool
+def _start_job(pipeline, *args):
+    job_id = uuid.uuid4().hex
+    _wait_for_purge(PROCESSED_FILES_FOLDER)
+    job_queue = _job_queue()
+    JOBS[job_id] = job_queue
+    future = WTP.submit(pipeline, *args, progress=job_queue)
+    future.add_done_callback(functools.partial(_finish_job, job_id, job_queue))
+    return jsonify({"status": "queued", "job_id": job_id})
+
+#stream the messages of a job as server-sent events
+def _sse(job_id):
+    job_queue = JOBS[job_id]
+    while True:
+        try:
+            msg = job_queue.get(timeout=SSE_HEARTBEAT_SECONDS)
+        except queue.Empty:
+            # keep the connection alive behind proxies
+            yield ": heartbeat\n\n"
+            continue
+        yield f"data: {json.dumps(msg)}\n\n"
+        if msg["stage"] == "done":
+            JOBS.pop(job_id, None)
+            break
+
 #process file for the whole cycle
 @app.route('/process_cycle', methods=['POST'])
 def process_cycle():
@@ -72,99 +181,35 @@ def process_cycle():
     global tracker_file_name
     if not file_dates_match(shift_record_file_name, tracker_file_name):
         return jsonify({"status": "error", "message": "The pay period start and end dates in the shift record and the old tracker do not match. yyyy-mm-dd."})
-    # Implement file processing logic here
-    try:
-        #folder paths
-        shift_record_path = './shift_record/shift_record.xlsx'
-        tracker_path = './old_tracker/old_tracker.xlsx'
-        save_path = './processed_files'
-        #remove old files
-        delete_files_in_folder("./processed_files")
-        #read shift record and check for errors
-        df, PAY_PERIOD, start_date, end_date = read_shift_record(shift_record_path)
-        #read old tracker adn check for errors
-        manager_rates, non_manager_rates, accrued_hrs, bonus_df, bonus, original_bonus_df, staff_info, prepaid_last_time, unpaid_last_time = read_old_tracker(tracker_path, start_date)
-        # format unpaid_last)time
-        unpaid_last_time = unpaid_last_time[df.columns]
-        #append overight shifts unpaid last time with df
-        df = pd.concat([df, unpaid_last_time], ignore_index=True)
-        #merge shift record with pay rates from the tracker
-        df_shift_merged = merge_shifts(df, staff_info, manager_rates, non_manager_rates)
-        # calculate worked holidays
-        df_shift_merged = calc_worked_holiday(df_shift_merged)
-        #calculate vacation and sick times
-        df_shift_merged, time_off, time_off_as_shifts = calc_time_off(df_shift_merged)
-        #crop the shift record based on pay cycle
-        df_shift_merged, df_after_pay_period, prepaid_hours, week_order, PREPAY = crop_shifts(df_shift_merged, start_date, end_date)
-        #generate payroll outputs
-        non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs = generate_payroll(df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, manager_rates, staff_info, prepaid_last_time, PAY_PERIOD, week_order, PREPAY)
-        #output payroll files
-        output_payroll_files(save_path, df_shift_merged, staff_info, non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs, original_bonus_df, time_off_as_shifts, non_manager_rates, manager_rates, prepaid_hours, df_after_pay_period, PAY_PERIOD)
-        #generate invoice outputs
-        shift_list, output, mgr_benefits, df_benefits, total_mgr = generate_invoice(df_shift_merged, manager_rates, non_manager_rates, staff_info, non_mgr_pr, mgr_pr)
-        #output invoice file
-        invoice_df = output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, total_mgr, df_shift_merged, PAY_PERIOD)
-        #output machine_readable payroll
-        output_underlying(mgr_pr, non_mgr_pr, invoice_df, save_path, PAY_PERIOD, True)
-       
-        file_names = [f for f in os.listdir(save_path) if os.path.isfile(os.path.join(save_path, f))]
-        #flag success
-        return jsonify({"status": "success", "message": "Files Processed Successfully!", "files": file_names})
-    except Exception as e:
-        # display error
-        return jsonify({"status": "error", "message": str(e)})
+    return _start_job(run_cycle, SHIFT_RECORD_PATH, OLD_TRACKER_PATH, PROCESSED_FILES_FOLDER)
 
 
 @app.route('/process_one', methods=['POST'])
 def process_one():
-    shift_record_path = './shift_record/shift_record.xlsx'
-    tracker_path = './old_tracker/old_tracker.xlsx'
-    save_path = './processed_files'
     selected_name = request.form.get('name_dropdown')
-    try:
-        if selected_name:
-                delete_files_in_folder("./processed_files")
-                df, PAY_PERIOD, start_date, end_date = read_one_person_record(shift_record_path, selected_name)
-                #read old tracker adn check for errors
-                manager_rates, non_manager_rates, accrued_hrs, bonus_df, bonus, original_bonus_df, staff_info, prepaid_last_time, unpaid_last_time = read_old_tracker(tracker_path, start_date)
-                unpaid_last_time = unpaid_last_time[df.columns]
-                #append overight shifts unpaid last time with df
-                df = pd.concat([df, unpaid_last_time], ignore_index=True)
-                #merge shift record with pay rates from the tracker
-                df_shift_merged = merge_shifts(df, staff_info, manager_rates, non_manager_rates)
-                # calculate worked holidays
-                df_shift_merged = calc_worked_holiday(df_shift_merged)
-                df_shift_merged, time_off, time_off_as_shifts = calc_time_off(df_shift_merged)
-                #crop the shift record based on pay cycle
-                df_shift_merged, df_after_pay_period, prepaid_hours, week_order, PREPAY = crop_shifts(df_shift_merged, start_date, end_date)
-                #generate payroll outputs
-                df_shift_merged = df_shift_merged.loc[df_shift_merged['Name'] == selected_name]
-                non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs = generate_payroll(df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, manager_rates, staff_info, prepaid_last_time, PAY_PERIOD, week_order, PREPAY)
-
-                #output payroll files
-                output_payroll_for_one(selected_name, save_path, df_shift_merged, non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, time_off_as_shifts, PAY_PERIOD)
-                    #output payroll files
-                output_underlying(mgr_pr, non_mgr_pr, {}, save_path, PAY_PERIOD, False)
-                file_names = [f for f in os.listdir(save_path) if os.path.isfile(os.path.join(save_path, f))]
-
-                return jsonify({"status": "success", "message": f"File Processed Successfully for {selected_name}", "files": file_names})
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)})
+    if not selected_name:
+        return jsonify({"status": "error", "message": "Please select a name."})
+    return _start_job(run_one, SHIFT_RECORD_PATH, OLD_TRACKER_PATH, PROCESSED_FILES_FOLDER, selected_name)
 
+#progress of a processing job
+@app.route('/progress/<job_id>')
+def progress(job_id):
+    if job_id not in JOBS:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return Response(stream_with_context(_sse(job_id)), mimetype='text/event-stream')
 
 @app.route('/save', methods=['GET'])
 def save_files():
-    save_path = app.config['PROCESSED_FILES_FOLDER']
-    file_names = [file for root, dirs, files in os.walk(save_path) for file in files]
+    save_path = PROCESSED_FILES_FOLDER
+    _wait_for_purge(save_path)
+    file_names = list_files(save_path)
     return jsonify({"file_names": file_names})
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    # Get the path to the processed file
-    processed_folder = app.config['PROCESSED_FILES_FOLDER']
-    file_path = os.path.join(processed_folder, filename)
-    # Send the file for download
-    return send_file(file_path, as_attachment=True)
+    # Send the processed file for download; send_from_directory refuses paths outside the folder
+    # and answers conditional and range requests
+    return send_from_directory(PROCESSED_FILES_FOLDER, filename, as_attachment=True, conditional=True)
 
 #refresh the processor for a new session.
 @app.route('/refresh')
@@ -172,19 +217,31 @@ def refresh_page():
     global shift_record_file_name
     global tracker_file_name
     # Extract the URL from the Referer header or default to the index page
-    delete_files_in_folder("./shift_record")
-    delete_files_in_folder("./old_tracker")
-    delete_files_in_folder("./processed_files")
+    _purge_later(SHIFT_RECORD_FOLDER, OLD_TRACKER_FOLDER, PROCESSED_FILES_FOLDER)
     shift_record_file_name = ''
     tracker_file_name = ''
     referer_url = request.headers.get('Referer', '/')
     return redirect(referer_url)
 
+#modification times of the uploads, or None if one is missing
+def _uploads_version():
+    try:
+        return (os.stat(SHIFT_RECORD_PATH).st_mtime_ns, os.stat(OLD_TRACKER_PATH).st_mtime_ns)
+    except OSError:
+        return None
+
 #get the names of non-managers
 @app.route('/get_names', methods=['GET'])
 def get_names():
-    names = get_name_list('./shift_record/shift_record.xlsx', './old_tracker/old_tracker.xlsx')
-    return {'names': names}
+    version = _uploads_version()
+    if version is None or NAMES_CACHE['version'] != version:
+        NAMES_CACHE['names'] = get_name_list(SHIFT_RECORD_PATH, OLD_TRACKER_PATH)
+        NAMES_CACHE['version'] = version
+    response = jsonify({'names': NAMES_CACHE['names']})
+    # let the browser revalidate its copy; it is reused until either file is uploaded again
+    response.set_etag(str(version))
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 # main
 if __name__ == '__main__':
@@ -19,9 +19,44 @@ from openpyxl.worksheet.datavalidation import DataValidation
 from openpyxl.styles import Color, PatternFill, Font, Border, Alignment, Font, Side
 from openpyxl.styles import colors, borders, numbers
 from openpyxl.styles.borders import Border
-from pandas.api.types import CategoricalDtype
+from pandas.api.types import CategoricalDtype, is_numeric_dtype
 from openpyxl.utils import get_column_letter
 import os
+import contextlib
+import time
+import functools
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+#shift codes carry a parenthesized code and sometimes a program prefix
+SHIFT_CODE_PATTERN = re.compile(r'\(.*\)')
+SHIFT_CODE_PREFIX = 'RC-SDP-CLS-320 '
+#columns every shift record must fill in
+REQUIRED_SHIFT_COLUMNS = ['Service 1 Description (Code)','Service Provider','Check-In Date','Check-In Time','Check-Out Date',
+                          'Check-Out Time','Staff Worked Duration (Minutes)']
+#invoice styles, made once (openpyxl styles are immutable, so cells share them)
+FILL_BLUE = PatternFill(fgColor=Color("9BC2E6"), fill_type="solid")
+FILL_LIGHT_GRAY = PatternFill(fgColor=Color("F2F2F2"), fill_type="solid")
+FILL_GRAY = PatternFill(fgColor=Color("D9D9D9"), fill_type="solid")
+FILL_DARK_GRAY = PatternFill(fgColor=Color("A6A6A6"), fill_type="solid")
+FONT_APARAJITA = Font(name="Aparajita")
+FONT_APARAJITA_BOLD = Font(name="Aparajita", bold=True)
+FONT_APARAJITA_14 = Font(name="Aparajita", size=14)
+FONT_APARAJITA_14_BOLD = Font(name="Aparajita", size=14, bold=True)
+THIN_SIDE = Side(border_style='thin', color='FF000000')
+BORDER_ALL = Border(top=THIN_SIDE, right=THIN_SIDE, bottom=THIN_SIDE, left=THIN_SIDE)
+BORDER_TOP_LEFT = Border(top=THIN_SIDE, left=THIN_SIDE)
+BORDER_TOP_RIGHT = Border(top=THIN_SIDE, right=THIN_SIDE)
+BORDER_BOTTOM_LEFT = Border(bottom=THIN_SIDE, left=THIN_SIDE)
+BORDER_BOTTOM_RIGHT = Border(bottom=THIN_SIDE, right=THIN_SIDE)
+BORDER_TOP = Border(top=THIN_SIDE)
+BORDER_RIGHT = Border(right=THIN_SIDE)
+BORDER_BOTTOM = Border(bottom=THIN_SIDE)
+BORDER_LEFT = Border(left=THIN_SIDE)
+#header style of a sheet written by to_excel (its thin borders have no color)
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
 
 
 def test():
@@ -37,15 +72,67 @@ def delete_files_in_folder(folder_path):
     folder_path -- path to folder
     '''
     try:
-        for file_name in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, file_name)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    os.remove(entry.path)
         return True, None  # Successful deletion
     except Exception as e:
         return False, str(e)  # Error occurred
 
 
+def list_files(folder_path):
+    '''
+    List the names of the files directly inside a flat folder.
+
+    folder_path -- path to folder
+    '''
+    with os.scandir(folder_path) as entries:
+        return [entry.name for entry in entries if entry.is_file()]
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_workbook(path, mtime_ns):
+    '''
+    Parse every tab of an .xlsx file. Cached on the file's modification time, so a new upload invalidates it.
+    The parsed tabs are also pickled next to the workbook, so the web process and the processing workers
+    (separate processes) only parse the Excel file once per upload.
+
+    path -- path to the workbook
+    mtime_ns -- modification time of the file in nanoseconds (part of the cache key only)
+    '''
+    cache_path = path + '.sheets.pkl'
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_mtime_ns, sheets = pickle.load(f)
+        if cached_mtime_ns == mtime_ns:
+            return sheets
+    except Exception: # no cache yet, or left over from an older upload or pandas version
+        pass
+    with pd.ExcelFile(path, engine='openpyxl') as xlsx:
+        sheets = {sheet: xlsx.parse(sheet_name=sheet) for sheet in xlsx.sheet_names}
+    # write to a temporary file first so that a concurrent reader never sees half a cache
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((mtime_ns, sheets), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError: # the cache is only an optimization
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+    return sheets
+
+def read_workbook(path):
+    '''
+    Read all tabs of an .xlsx file, reusing the parsed tabs if the file has not changed since the last read.
+
+    path -- path to the workbook
+
+    return a dictionary mapping tab names (in workbook order) to copies of the cached pandas dataframes.
+    '''
+    sheets = _cached_workbook(path, os.stat(path).st_mtime_ns)
+    return {name: sheet.copy() for name, sheet in sheets.items()}
+
 def extract_dates_from_filename(file_name):
     """
     Extracts start and end dates from a file name using regular expressions.
@@ -89,14 +176,14 @@ def get_name_list(shift_record_path, old_tracker_path):
     # Problem with uploaded files shoudl be flagged in other functions.
     try:
         # get the names
-        df = pd.read_excel(shift_record_path)
+        df = next(iter(read_workbook(shift_record_path).values()))
         df = df[['Service Provider']]
         df['Name'] = df['Service Provider'].str.split(' /', n=1).str[0]
         df[['Last Name', 'First Name']] = df['Name'].str.split(', ', expand=True)
         # concatenate First name and Last Name columns in the desired order
         df['Name'] = df['First Name'] + ' ' + df['Last Name']
         name_set = set(df['Name'].unique())
-        manager_rates = pd.read_excel(old_tracker_path, sheet_name="MANAGER INFO")
+        manager_rates = read_workbook(old_tracker_path)["MANAGER INFO"]
         # do not include managers
         manager_set = set(manager_rates['Name'].unique())
         name_set = name_set - manager_set
@@ -105,6 +192,42 @@ def get_name_list(shift_record_path, old_tracker_path):
     except: 
         return [] 
 
+def from_categories(categorical, values):
+    '''
+    Expand values computed once per category back to one value per row.
+    Low-cardinality text columns (shift codes, provider names) are cleaned on their categories only.
+
+    categorical -- a pandas series of category dtype
+    values -- a pandas Index (or array) with one value per category
+
+    return a pandas series of object dtype aligned with categorical; missing rows stay missing.
+    '''
+    codes = categorical.cat.codes.to_numpy()
+    result = np.asarray(values, dtype=object)[codes]
+    result[codes == -1] = np.nan
+    return pd.Series(result, index=categorical.index)
+
+def split_overnight_shifts(df):
+    '''
+    Split shifts that span two days at midnight.
+
+    df -- a pandas dataframe containing shift records
+
+    returns a dataframe where each split shift is replaced by its first-day part followed by its second-day part.
+    '''
+    cross = df['CIDT'].dt.weekday != df['CODT'].dt.weekday
+    midnight = df.loc[cross, 'CODT'].dt.normalize()
+    # the portion of the shift that occurred on the first day
+    first_day = df.copy()
+    first_day.loc[cross, 'CODT'] = midnight
+    # the portion of the shift that occurred on the second day
+    second_day = df.loc[cross].copy()
+    second_day['CIDT'] = midnight
+    # keep each second part right after its first part
+    position = np.arange(len(df))
+    order = np.argsort(np.concatenate([position, position[cross.to_numpy()]]), kind='stable')
+    return pd.concat([first_day, second_day]).iloc[order]
+
 def check_shift_overlap(df, name):
     '''
     Check overlapping shifts for the same person.
@@ -112,25 +235,34 @@ def check_shift_overlap(df, name):
     df -- a pandas dataframe containing shift records
     name -- name of the employee
 
+    returns a string indicating overlapping shifts for the employee.
+    '''
+    return check_shift_overlaps(df.loc[df.Name==name])
+
+def check_shift_overlaps(df):
+    '''
+    Check overlapping shifts for every person in one pass.
+
+    df -- a pandas dataframe containing shift records
+
     algorithm outline:
-        1. subsetting to one individual's record
-        2. sort by the person's shift by datetime 
-        3. check overlap of shift indexed by t and t+1 for all t<T
+        1. sort the shifts by person (in order of first appearance), then by datetime
+        2. pair each shift with the person's next shift
+        3. flag the pairs where the shift ends more than a minute after the next one starts
 
-    returns a string indicating overlapping shifts for the employee.
+    returns a string indicating overlapping shifts, grouped by employee.
     '''
-    #get all shifts from one person
-    df_indiv = df.loc[df.Name==name]
-    df_indiv = df_indiv.sort_values(by='CIDT')
-    err_string = ""
-    if len(df_indiv) == 1: #no overlap if just one shift
-        pass
-    else:
-        for index in range(len(df_indiv)-1):
-            if (df_indiv.iloc[index].CODT - df_indiv.iloc[index+1].CIDT).total_seconds() > 60: #considered overlap if overlapping time is greater than 1 minute.
-                problem_date = df_indiv.iloc[index+1]['Check-In Date']
-                err_string = err_string + (f'Overlapping shifts detected for {name} on {problem_date} for Shift type {df_indiv.iloc[index].Shift} and {df_indiv.iloc[index+1].Shift}.    ')
-    return err_string
+    df = df.assign(person=pd.factorize(df['Name'])[0])
+    df = df.sort_values(by=['person', 'CIDT'], kind='mergesort')
+    next_shift = df.groupby('Name')[['CIDT', 'Check-In Date', 'Shift']].shift(-1)
+    #considered overlap if overlapping time is greater than 1 minute.
+    overlap = (df['CODT'] - next_shift['CIDT']).dt.total_seconds() > 60
+    # build all messages column-wise instead of row by row
+    messages = ('Overlapping shifts detected for ' + df.loc[overlap, 'Name'].astype(str)
+                + ' on ' + next_shift.loc[overlap, 'Check-In Date'].astype(str)
+                + ' for Shift type ' + df.loc[overlap, 'Shift'].astype(str)
+                + ' and ' + next_shift.loc[overlap, 'Shift'].astype(str) + '.    ')
+    return messages.str.cat()
 
 def check_unusual_overnight(df):
     '''
@@ -145,37 +277,49 @@ def check_unusual_overnight(df):
     returns a string indicating unsual overnight shifts for the employee.
     '''
     allowed_shifts = ['OA1', 'OA2', 'IHSS-Asleep', 'OPA']
-    start_time = datetime.time(7, 15)  # 7:15 AM
-    end_time = datetime.time(22, 45)   # 10:45 PM
+    start_time = pd.Timedelta(hours=7, minutes=15)  # 7:15 AM
+    end_time = pd.Timedelta(hours=22, minutes=45)   # 10:45 PM
+    # time of day of each check-in, computed once
+    check_in_time = df['CIDT'] - df['CIDT'].dt.normalize()
     # Create a mask for your conditions
     mask = (
         df['Shift'].isin(allowed_shifts) & 
-        (df['CIDT'].dt.time > start_time) & 
-        (df['CIDT'].dt.time < end_time)
+        (check_in_time > start_time) & 
+        (check_in_time < end_time)
     )
     # Apply the mask to get a subset of susceptible shifts
     subset_df = df[mask]
-    err_string = ""
-    for _, row in subset_df.iterrows():
-        name = row['Name']
-        problem_date = row['Check-In Date']
-        problem_shift = row['Shift']
-        err_string = err_string + (f'Unusual timing for shift {problem_shift} detected for {name} on {problem_date}.    ')
-    return err_string
+    # build all messages column-wise instead of row by row
+    messages = ('Unusual timing for shift ' + subset_df['Shift'].astype(str)
+                + ' detected for ' + subset_df['Name'].astype(str)
+                + ' on ' + subset_df['Check-In Date'].astype(str) + '.    ')
+    return messages.str.cat()
+
+@functools.lru_cache(maxsize=8)
+def us_holidays(year):
+    '''
+    Get the US federal holidays of one year (building them is not cheap, so they are cached).
+
+    year -- the year
+
+    return a dictionary mapping holiday dates to holiday names.
+    '''
+    return dict(holidays.US(years=year))
 
+@functools.lru_cache(maxsize=32)
 def approved_holiday(years):
     '''
     Get a set of approved holiday hours.
 
-    years -- a iterable containing the years appeared in the shift record
+    years -- a frozenset containing the years appeared in the shift record
 
-    return a set of approved holiday dates.
+    return a frozenset of approved holiday dates.
     '''
     # set of holidays
     approved_holiday = set()
     holiday_set = set(["Thanksgiving", "Christmas Day", "Labor Day"])
     for year in years:
-        holiday_ls = {k for k, v in holidays.US(years=year).items() if v in holiday_set}
+        holiday_ls = {k for k, v in us_holidays(year).items() if v in holiday_set}
         approved_holiday = approved_holiday.union(holiday_ls)
         approved_holiday.add(easter(year)) #Easter
         approved_holiday.add(datetime.date(year, 12, 24)) #Christmas eve
@@ -184,15 +328,16 @@ def approved_holiday(years):
         approved_holiday.add(datetime.date(year-1, 12, 31)) #Last New Year
         approved_holiday.add(datetime.date(year, 7, 4)) #Independence Day
 
-    return approved_holiday
+    return frozenset(approved_holiday)
 
+@functools.lru_cache(maxsize=32)
 def approved_holiday_hours(years):
     '''
     Return a list of approve holiday datetime range.
 
-    years -- a iterable containing the years appeared in the shift record
+    years -- a frozenset containing the years appeared in the shift record
 
-    return a list of holiday datetime ranges
+    return a tuple of holiday datetime ranges
     '''
     #create a time interval object
     Range = namedtuple('Range', ['start', 'end'])
@@ -202,25 +347,23 @@ def approved_holiday_hours(years):
         approved_holiday_dt.append(Range(start=datetime.datetime.combine(x, datetime.time(hour=0)),
                                          end=datetime.datetime.combine(x + datetime.timedelta(days=1),
                                                                        datetime.time(hour=0))))
-    return approved_holiday_dt
+    return tuple(approved_holiday_dt)
 
-def work_holiday_overlap(work_range, ahh_list):
+@functools.lru_cache(maxsize=32)
+def approved_holiday_ns(years):
     '''
-    Get the overlap of worked hours and approved holiday hours
+    Return the approved holiday datetime ranges as int64 nanoseconds, for array math.
 
-    work_range -- the range of the worked shifts during the pay cycle
-    ahh_list -- a list of approved holiday hours (datetime range)
+    years -- a frozenset containing the years appeared in the shift record
 
-    return the total overlapping time in minutes.
+    return read-only numpy arrays of the holiday starts and ends.
     '''
-    total_overlap = 0.0
-    for ahh in ahh_list:
-        latest_start = max(work_range.start, ahh.start)
-        earliest_end = min(work_range.end, ahh.end)
-        delta = (earliest_end - latest_start)
-        overlap = max(0, delta.total_seconds())
-        total_overlap += overlap
-    return total_overlap/60 #in minutes
+    ahh_list = approved_holiday_hours(years)
+    starts = np.array([ahh.start for ahh in ahh_list], dtype='datetime64[ns]').view('int64')
+    ends = np.array([ahh.end for ahh in ahh_list], dtype='datetime64[ns]').view('int64')
+    starts.setflags(write=False)
+    ends.setflags(write=False)
+    return (starts, ends)
 
 def calc_worked_holiday(df):
         '''
@@ -230,51 +373,149 @@ def calc_worked_holiday(df):
 
         return a pandas dataframe with holiday worked hours
         '''
-        #create a time interval object
-        Range = namedtuple('Range', ['start', 'end'])
         # a list of all years in the shift data
-        years = set([min([df.iloc[i]['CIDT'].year for i in range(len(df))]), max([df.iloc[i]['CODT'].year for i in range(len(df))])])
-        #range for each shift
-        duration_range = [Range(start = df.iloc[i]['CIDT'].to_pydatetime(), end = df.iloc[i]['CODT'].to_pydatetime()) for i in range(len(df))]
-        ahh_list = approved_holiday_hours(years)
-        holiday_work_time = [work_holiday_overlap(duration_range[i], ahh_list) for i in range(len(df))]
-        df['Holiday Worked Duration (Minutes)'] = holiday_work_time
+        years = frozenset([int(df['CIDT'].dt.year.min()), int(df['CODT'].dt.year.max())])
+        holiday_start, holiday_end = approved_holiday_ns(years)
+        #overlap of every shift (rows) with every holiday (columns), in int64 nanoseconds
+        latest_start = np.maximum(df['CIDT'].to_numpy(dtype='datetime64[ns]').view('int64')[:, None], holiday_start)
+        earliest_end = np.minimum(df['CODT'].to_numpy(dtype='datetime64[ns]').view('int64')[:, None], holiday_end)
+        overlap = np.maximum(earliest_end - latest_start, 0)
+        df['Holiday Worked Duration (Minutes)'] = overlap.sum(axis=1) / 1e9 / 60 #in minutes
         return df
 
-def is_manager(name, manager_rates):
+def is_manager(name, manager_names):
     '''
     Check if the person is a manager
 
     name -- name of the employee
-    manager_rates -- pandas dataframe containing manager rates.
+    manager_names -- frozenset of the names in the MANAGER INFO tab (build it once per run).
 
     return a boolean indicating manager status.
     '''
-    return name in set(manager_rates['Name'])
+    return name in manager_names
 
-def manager_is_exempt(name, df):
+def group_rows_by(df, column):
     '''
-    Check if the manager has exempt status in that week, assuming the dataframe is a cleaned weekly df.
-    
-    name -- name of the employee
-    df -- a pandas dataframe containing shift records
+    Split a dataframe into the rows of each value of a column once, so that per-person lookups
+    in the payroll loops do not rescan the whole dataframe.
+
+    df -- a pandas dataframe
+    column -- the column to group by (e.g. 'Name')
 
-    return a boolean indicating exempt status.
+    return a function mapping a value to its rows, in their original order (no rows gives an empty dataframe).
     '''
-    exempt_mins = df.loc[(df['Name'] == name) & (df['Shift'] != 'MGR-Direct-Care')]['Min. Worked'].sum()
-    non_exempt_mins = df.loc[(df['Name'] == name) & (df['Shift'] == 'MGR-Direct-Care')]['Min. Worked'].sum()
-    return exempt_mins >= non_exempt_mins
+    no_rows = df.iloc[:0]
+    if len(df) == 0: # an empty tab may not even have the column
+        return lambda value: no_rows
+    groups = dict(tuple(df.groupby(column, sort=False)))
+    return lambda value: groups.get(value, no_rows)
 
-def worked_overtime(name, df):
+def rates_by_name(manager_rates):
     '''
-    Check if a person worked overtime in that week, assuming the dataframe is a cleaned weekly df.
-    
-    name -- name of the employee
-    df -- a pandas dataframe containing shift records for one work week
+    Index the manager rates by name once, so that per-manager lookups in the payroll loops
+    do not rescan the whole dataframe.
+
+    manager_rates -- rates of managers (one row per name; the first row is used if a name repeats)
+
+    return a dict mapping each name to a dict of its row (column -> value, numpy scalars kept as is).
+    '''
+    first_rows = manager_rates.drop_duplicates('Name')
+    columns = {column: first_rows[column].to_numpy() for column in first_rows.columns}
+    return {name: {column: values[i] for column, values in columns.items()} for i, name in enumerate(first_rows['Name'])}
+
+def worked_minutes_by_name(df_worked):
+    '''
+    Sum the minutes worked and the holiday minutes worked of each person in one groupby,
+    so the payroll loops only look the totals up.
+
+    df_worked -- a pandas dataframe containing the worked shifts (no '-Not-Worked' shifts)
+
+    return a function mapping a name to its minutes worked and holiday minutes worked (0, 0 without worked shifts).
+    '''
+    if len(df_worked) == 0:
+        return lambda name: (0, 0)
+    totals = df_worked.groupby('Name')[['Min. Worked', 'Holiday Worked Duration (Minutes)']].sum()
+    def lookup(name):
+        if name not in totals.index:
+            return (0, 0)
+        return (totals.at[name, 'Min. Worked'], totals.at[name, 'Holiday Worked Duration (Minutes)'])
+    return lookup
+
+def weekly_overtime(minutes, bot_wage, worked):
+    '''
+    Compute the overtime figures of one work week on NumPy arrays (NaNs are skipped, as pandas sums do).
+
+    minutes -- array of minutes of each shift in the week
+    bot_wage -- array of BOT hourly wages of each shift
+    worked -- boolean array, False for shifts that are paid but not worked
+
+    return weekly hours worked, weekly hours paid, overtime hours, and the BOT-weighted overtime rate.
+    '''
+    weekly_hours_worked = round(np.nansum(minutes[worked])/60, 2)
+    weekly_hours_paid = round(np.nansum(minutes)/60, 2)
+    overtime_hours = max(0, weekly_hours_worked - 40)
+    ot_rate = np.nansum(bot_wage * np.round(minutes/60, 2))/weekly_hours_paid
+    return (weekly_hours_worked, weekly_hours_paid, overtime_hours, ot_rate)
+
+def weekly_overtime_by_name(df_shift_merged, names, prepaid_last_time, first_week):
+    '''
+    Compute the weekly overtime of several people at once, with one groupby over person and work week
+    (the same figures as weekly_overtime() gives week by week).
+    Shifts prepaid last time count toward the first week of the pay period for the people who worked that week.
+
+    df_shift_merged -- shift dataframe for the pay period
+    names -- names of the people to compute overtime for
+    prepaid_last_time -- shifts prepaid last time
+    first_week -- first week of the pay period ('YYYY-MM-DD' of its Monday)
 
-    return a boolean indicating whether the employee worked overtime for the week
+    return a pandas dataframe with one row per person and week with overtime:
+    Name, Week, Overtime Hours, and OT Rate (the BOT-weighted overtime rate).
     '''
-    return df.loc[df['Name'] == name]['Min. Worked'].sum() > (40*60)
+    columns = ['Name', 'Shift', 'Min. Worked', 'BOT Hourly Wage']
+    is_selected = df_shift_merged['Name'].isin(names)
+    # shifts are summed in check-in order, as in split_by_work_week(), so the totals round the same way
+    selected = df_shift_merged.loc[is_selected]
+    selected = selected.iloc[np.argsort(selected['CIDT'].to_numpy(), kind='mergesort')]
+    cidt = selected['CIDT']
+    # weeks are keyed by their Monday, as in split_by_work_week()
+    week = (cidt.dt.normalize() - pd.to_timedelta(cidt.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+    shifts = selected[columns].assign(Week=week)
+    if len(prepaid_last_time) > 0:
+        first_week_names = shifts.loc[shifts['Week'] == first_week, 'Name'].unique()
+        prepaid = prepaid_last_time.loc[prepaid_last_time['Name'].isin(first_week_names), columns]
+        shifts = pd.concat([prepaid.assign(Week=first_week), shifts], ignore_index=True)
+    # none of them has a shift (e.g. only bonuses or time off)
+    if shifts.empty:
+        return pd.DataFrame(columns=['Name', 'Week', 'Overtime Hours', 'OT Rate'])
+    minutes = shifts['Min. Worked'].astype(float)
+    worked = ~shifts['Shift'].str.contains('-Not-Worked', regex=False)
+    weekly = pd.DataFrame({'Name': shifts['Name'], 'Week': shifts['Week'], 'Worked': minutes.where(worked), 'Paid': minutes,
+                           'BOT Pay': shifts['BOT Hourly Wage'].astype(float) * (minutes/60).round(2)})
+    # np.nansum keeps weekly_overtime()'s summation order
+    weekly = weekly.groupby(['Name', 'Week'], sort=True).agg(lambda col: np.nansum(col.to_numpy())).reset_index()
+    weekly_hours_worked = (weekly['Worked']/60).round(2)
+    weekly_hours_paid = (weekly['Paid']/60).round(2)
+    weekly['Overtime Hours'] = (weekly_hours_worked - 40).clip(lower=0)
+    weekly['OT Rate'] = weekly['BOT Pay'] / weekly_hours_paid
+    return weekly.loc[weekly['Overtime Hours'] > 0, ['Name', 'Week', 'Overtime Hours', 'OT Rate']]
+
+def _sort_by_check_in(df):
+    '''
+    Order shift records by check-in time and key each shift by the Monday its work week (Mon-Sun) starts on.
+    Ties keep their record order; the caller's dataframe is left untouched.
+
+    df -- a pandas dataframe containing shift records
+
+    return the sorted dataframe (leading with its CIDT column) and the week key of each of its rows.
+    '''
+    cidt = pd.to_datetime(df['CIDT'])
+    order = np.argsort(cidt.to_numpy(), kind='mergesort')
+    # each week's dataframe leads with its CIDT column
+    columns = ['CIDT'] + [col for col in df.columns if col != 'CIDT']
+    cidt = cidt.iloc[order]
+    df_sorted = df.iloc[order][columns].assign(CIDT=cidt)
+    week_key = cidt.dt.normalize() - pd.to_timedelta(cidt.dt.weekday, unit='D')
+    return (df_sorted, week_key)
 
 def split_by_work_week(df):
     '''
@@ -285,36 +526,60 @@ def split_by_work_week(df):
 
     return a list of dataframe in which each element is a dataframe containing shift record for each week.
     '''
-    # Convert the CIDT column to a datetime datatype
-    df['CIDT'] = pd.to_datetime(df['CIDT'])
-    # Set the CIDT column as the dataframe index
-    df.set_index('CIDT', inplace=True)
-    # Resample the dataframe by work week (Mon-Sun)
-    week_groups = df.resample('W-MON', label='left', closed='left')
+    # Group the dataframe by work week (Mon-Sun), keyed by the Monday each shift's week starts on
+    # (shifts are ordered by check-in time within a week, ties keeping their record order).
+    df_sorted, week_key = _sort_by_check_in(df)
+    week_groups = dict(list(df_sorted.groupby(week_key, sort=True)))
     # Create a dictionary to store each work week dataframe
     week_dataframes = {}
-    # Iterate over the work week groups and store each dataframe in the dictionary
-    for week_start, week_df in week_groups: 
-        week_df.reset_index(inplace=True) 
-        week_dataframes[week_start.strftime('%Y-%m-%d')] = week_df 
-    df.reset_index(inplace=True) 
+    # weeks without shifts between the first and last week are kept as empty dataframes
+    if len(df) > 0:
+        for week_start in pd.date_range(week_key.min(), week_key.max(), freq='7D'):
+            week_df = week_groups.get(week_start, df_sorted.iloc[:0])
+            week_dataframes[week_start.strftime('%Y-%m-%d')] = week_df.reset_index(drop=True)
     return week_dataframes 
 
-def read_shift_record(shift_record_path):
+def split_by_name_and_work_week(df):
+    '''
+    Split shift records by person and work week in one groupby, for the per-person weekly loops.
+
+    df -- a pandas dataframe containing shift records
+
+    return a function mapping a name to what split_by_work_week() gives on that person's shifts ({} without shifts).
+    '''
+    if len(df) == 0:
+        return lambda name: {}
+    df_sorted, week_key = _sort_by_check_in(df)
+    groups = dict(list(df_sorted.groupby([df_sorted['Name'], week_key], sort=False)))
+    week_span = week_key.groupby(df_sorted['Name']).agg(['min', 'max'])
+    def lookup(name):
+        week_dataframes = {}
+        if name in week_span.index:
+            # weeks without shifts between the person's first and last week are kept as empty dataframes
+            for week_start in pd.date_range(week_span.at[name, 'min'], week_span.at[name, 'max'], freq='7D'):
+                week_df = groups.get((name, week_start), df_sorted.iloc[:0])
+                week_dataframes[week_start.strftime('%Y-%m-%d')] = week_df.reset_index(drop=True)
+        return week_dataframes
+    return lookup
+
+def _read_shift_record(shift_record_path, selected_name=None):
     '''
     Read in shift records, check for errors, and return cleaned dataset along with other relevant info.
+    Shared by read_shift_record() and read_one_person_record().
 
     shift_record_path -- file path to shift record
+    selected_name -- full name of the staff ("First Last") to keep, or None to keep everyone
 
     return a pandas dataframe df, and strings PAY_PERIOD, start_date, end_date 
     '''
-    #read dataset from path
+    #read dataset from path (all tabs are parsed from one pass over the workbook)
     try:
-        df = pd.read_excel(shift_record_path)
+        sheets = read_workbook(shift_record_path)
+        df = next(iter(sheets.values()))
     except:
         raise FileNotFoundError("Cannot open the shift record file. Make sure it's an .XLSX file.")
     try:
-        report_criteria = pd.read_excel(shift_record_path, sheet_name="Report Criteria", engine='openpyxl')
+        report_criteria = sheets["Report Criteria"]
         # Convert the dataframe into a dictionary for easier access
         criteria_dict = dict(zip(report_criteria['Report Criteria'], report_criteria['Value']))
         # Parse the dates and create datetime.datetime objects
@@ -338,22 +603,29 @@ def read_shift_record(shift_record_path):
         except:
             raise ValueError("The shift record does not contain all columns needed. It needs to at least contain 'Service 1 Description (Code)','Service Provider','Check-In Date','Check-In Time','Check-Out Date','Check-Out Time','Staff Worked Duration (Minutes)'.")
         pre_cleaned = True
-    #missing value check
-    for col in ['Service 1 Description (Code)','Service Provider','Check-In Date','Check-In Time','Check-Out Date','Check-Out Time'
-                ,'Staff Worked Duration (Minutes)']:
-        if len(df.loc[df[col].isnull()]) != 0:
-            raise ValueError(f"Some shifts have missing {col}.")
-    #clean shift code
-    df['Shift'] = df['Service 1 Description (Code)'].str.replace(r'\(.*\)', '')
-    # Remove prefix if it exists
-    prefix = 'RC-SDP-CLS-320 '
-    df['Shift'] = df['Shift'].apply(lambda x: x[len(prefix):] if x.startswith(prefix) else x)
-    df['Shift'] = df['Shift'].apply(lambda x: x.rstrip())
     #clean name
-    df['Name'] = df['Service Provider'].str.split(' /', n=1).str[0]
-    df[['Last Name', 'First Name']] = df['Name'].str.split(', ', expand=True)
-    # concatenate First name and Last Name columns in the desired order
-    df['Name'] = df['First Name'] + ' ' + df['Last Name']
+    providers = df['Service Provider'].astype('category')
+    name_parts = providers.cat.categories.str.split(' /', n=1).str[0].str.split(', ')
+    # concatenate First name and Last Name in the desired order
+    full_name = from_categories(providers, name_parts.str[1] + ' ' + name_parts.str[0])
+    if selected_name is not None:
+        # keep only the relevant name, before any other cleanup so it runs on that staff's shifts only
+        is_selected = full_name == selected_name
+        df = df.loc[is_selected].copy()
+        providers = providers[is_selected]
+        full_name = full_name[is_selected]
+    #missing value check (one pass over the required columns, reporting the first one with gaps)
+    has_missing = df[REQUIRED_SHIFT_COLUMNS].isna().any()
+    if has_missing.any():
+        raise ValueError(f"Some shifts have missing {has_missing.idxmax()}.")
+    #clean shift code, removing the prefix if it exists
+    shift_codes = df['Service 1 Description (Code)'].astype('category')
+    df['Shift'] = from_categories(shift_codes, shift_codes.cat.categories.str.replace(SHIFT_CODE_PATTERN, '', regex=True)
+                                  .str.removeprefix(SHIFT_CODE_PREFIX)
+                                  .str.rstrip())
+    df['Name'] = full_name
+    df['Last Name'] = from_categories(providers, name_parts.str[0])
+    df['First Name'] = from_categories(providers, name_parts.str[1])
     # drop First name and Last Name columns
     df = df.drop(["Service 1 Description (Code)", "Service Provider"], axis=1)
     # Replace Date/Time with Updated Date/Time if the latter is not NaN
@@ -372,17 +644,18 @@ def read_shift_record(shift_record_path):
     try:
         CIDT = df['Check-In Date'].str.cat(df['Check-In Time'], sep=' ')
         CODT = df['Check-Out Date'].str.cat(df['Check-Out Time'], sep=' ')
-        CIDT = CIDT.apply(lambda x: datetime.datetime.strptime(x, r'%m/%d/%Y %I:%M %p'))
-        CODT = CODT.apply(lambda x: datetime.datetime.strptime(x, r'%m/%d/%Y %I:%M %p'))
+        CIDT = pd.to_datetime(CIDT, format=r'%m/%d/%Y %I:%M %p', cache=True)
+        CODT = pd.to_datetime(CODT, format=r'%m/%d/%Y %I:%M %p', cache=True)
+        if selected_name is not None:
+            # an off-cycle pay period covers the staff's own shifts
+            PAY_PERIOD = str(CIDT.min().date()) + ' - ' + str(CIDT.max().date())
         # add python-format datetime to the dataframe
         df['CIDT'] = CIDT
         df['CODT'] = CODT
     except:
         raise RuntimeError("Cannot convert date and time to Python's own format.")
     # Check for overlapping shifts
-    err_string = ""
-    for name in df.Name.unique():
-        err_string = err_string + check_shift_overlap(df, name)
+    err_string = check_shift_overlaps(df)
     if err_string != "":
         raise ValueError(err_string)
     # Check for unsual overnight shifts
@@ -390,31 +663,15 @@ def read_shift_record(shift_record_path):
     if err_string != "":
         raise ValueError(err_string)
     # Split shifts that span two days
-    new_rows = []
-    # loop through each row of the original dataframe
-    for index, row in df.iterrows():
-        # check if CIDT is on the same date as CODT
-        if row['CIDT'].weekday() != row['CODT'].weekday():
-            # create a new row for the portion of the shift that occurred on Sunday
-            first_day_row = row.copy()
-            first_day_row['CODT'] = pd.to_datetime(str(row['CODT'].date()) + ' 00:00:00')
-            new_rows.append(first_day_row)
-            # create a new row for the portion of the shift that occurred on Monday
-            second_day_row = row.copy()
-            second_day_row['CIDT'] = pd.to_datetime(str(row['CODT'].date()) + ' 00:00:00')
-            new_rows.append(second_day_row)
-        else:
-            new_rows.append(row)
-    # create a new dataframe from the modified rows
-    new_df = pd.DataFrame(new_rows)
+    new_df = split_overnight_shifts(df)
     # sort the new dataframe by CIDT
     new_df = new_df.sort_values(by=['CIDT'])
     # reset the index of the new dataframe
     new_df = new_df.reset_index(drop=True)
-    new_df['Check-In Date'] = new_df['CIDT'].apply(lambda x: x.strftime('%m/%d/%Y'))
-    new_df['Check-In Time'] = new_df['CIDT'].apply(lambda x: x.strftime('%I:%M %p'))
-    new_df['Check-Out Date'] = new_df['CODT'].apply(lambda x: x.strftime('%m/%d/%Y'))
-    new_df['Check-Out Time'] = new_df['CODT'].apply(lambda x: x.strftime('%I:%M %p'))
+    new_df['Check-In Date'] = new_df['CIDT'].dt.strftime('%m/%d/%Y')
+    new_df['Check-In Time'] = new_df['CIDT'].dt.strftime('%I:%M %p')
+    new_df['Check-Out Date'] = new_df['CODT'].dt.strftime('%m/%d/%Y')
+    new_df['Check-Out Time'] = new_df['CODT'].dt.strftime('%I:%M %p')
     new_df['Min. Worked'] = ((new_df['CODT'] - new_df['CIDT']).dt.total_seconds() / 60).round(2)
     df = new_df
     df['Shift_original'] = df['Shift']
@@ -425,6 +682,16 @@ def read_shift_record(shift_record_path):
     df = df.drop('Staff Worked Duration (Minutes)', axis=1)
     return (df, PAY_PERIOD, start_date, end_date)
 
+def read_shift_record(shift_record_path):
+    '''
+    Read in shift records, check for errors, and return cleaned dataset along with other relevant info.
+
+    shift_record_path -- file path to shift record
+
+    return a pandas dataframe df, and strings PAY_PERIOD, start_date, end_date 
+    '''
+    return _read_shift_record(shift_record_path)
+
 def read_one_person_record(shift_record_path, selected_name):
     '''
     Read the record of a specifc staff for off-cycle payroll.
@@ -435,124 +702,7 @@ def read_one_person_record(shift_record_path, selected_name):
 
     return pandas dataframes: shift record (df), pay period, start date, and end date.
     '''
-    #read dataset from path
-    try:
-        df = pd.read_excel(shift_record_path)
-    except:
-        raise FileNotFoundError("Cannot open the shift record file. Make sure it's an .XLSX file.")
-    try:
-        report_criteria = pd.read_excel(shift_record_path, sheet_name="Report Criteria", engine='openpyxl')
-        # Convert the dataframe into a dictionary for easier access
-        criteria_dict = dict(zip(report_criteria['Report Criteria'], report_criteria['Value']))
-        # Parse the dates and create datetime.datetime objects
-        start_date = datetime.datetime.strptime(criteria_dict.get('Slot Start Date From'), '%m/%d/%Y')
-        end_date = datetime.datetime.strptime(criteria_dict.get('Slot Start Date To'), '%m/%d/%Y')
-        PAY_PERIOD = str(start_date.date()) + ' - ' + str(end_date.date())
-        end_date = end_date + datetime.timedelta(days=1)
-    except:
-        raise ValueError(f"Cannot read report criteria.")
-    # indicating whether the data has been pre-processed
-    pre_cleaned = False
-    #subsetting useful columns
-    try: #raw dataset
-        df = df[['Service 1 Description (Code)','Service Provider','Check-In Date','Check-In Time',
-                 'Updated Check-In Date','Updated Check-In Time','Check-Out Date','Check-Out Time','Updated Check-Out Date',
-                'Updated Check-Out Time','Staff Worked Duration','Staff Worked Duration (Minutes)']]
-    except:
-        try: # cleaned dataset
-            df = df[['Service 1 Description (Code)','Service Provider','Check-In Date','Check-In Time','Check-Out Date',
-                     'Check-Out Time','Staff Worked Duration (Minutes)']]
-        except:
-            raise ValueError("The shift record does not contain all columns needed. It needs to at least contain 'Service 1 Description (Code)','Service Provider','Check-In Date','Check-In Time','Check-Out Date','Check-Out Time','Staff Worked Duration (Minutes)'.")
-        pre_cleaned = True
-    #clean name and keep only relevant name
-    df['Name'] = df['Service Provider'].str.split(' /', n=1).str[0]
-    df[['Last Name', 'First Name']] = df['Name'].str.split(', ', expand=True)
-    # concatenate First name and Last Name columns in the desired order
-    df['Name'] = df['First Name'] + ' ' + df['Last Name']
-    df = df.loc[df['Name'] == selected_name]
-    #missing value check
-    for col in ['Service 1 Description (Code)','Service Provider','Check-In Date','Check-In Time','Check-Out Date','Check-Out Time'
-                ,'Staff Worked Duration (Minutes)']:
-        if len(df.loc[df[col].isnull()]) != 0:
-            raise ValueError(f"Some shifts have missing {col}.")
-    #clean shift code
-    df['Shift'] = df['Service 1 Description (Code)'].str.replace(r'\(.*\)', '')
-    # Remove prefix if it exists
-    prefix = 'RC-SDP-CLS-320 '
-    df['Shift'] = df['Shift'].apply(lambda x: x[len(prefix):] if x.startswith(prefix) else x)
-    df['Shift'] = df['Shift'].apply(lambda x: x.rstrip())
-    # drop First name and Last Name columns
-    df = df.drop(["Service 1 Description (Code)", "Service Provider"], axis=1)
-    # Replace Date/Time with Updated Date/Time if the latter is not NaN
-    try:
-        df['Check-In Date'] = df['Updated Check-In Date'].fillna(df['Check-In Date'])
-        df['Check-In Time'] = df['Updated Check-In Time'].fillna(df['Check-In Time'])
-        df['Check-Out Date'] = df['Updated Check-Out Date'].fillna(df['Check-Out Date'])
-        df['Check-Out Time'] = df['Updated Check-Out Time'].fillna(df['Check-Out Time'])
-        # drop unnecessary columns once the info is integrated.
-        df.drop(['Updated Check-In Date', 'Updated Check-In Time','Updated Check-Out Date', 
-                 'Updated Check-Out Time'], axis=1, inplace=True)
-    except:
-        if pre_cleaned == False:
-            raise RuntimeError("Cannot update check-in/out date/times using updated check-in/out dates/times.")
-    #Convert date and time to python-style datetime format
-    try:
-        CIDT = df['Check-In Date'].str.cat(df['Check-In Time'], sep=' ')
-        CODT = df['Check-Out Date'].str.cat(df['Check-Out Time'], sep=' ')
-        CIDT = CIDT.apply(lambda x: datetime.datetime.strptime(x, r'%m/%d/%Y %I:%M %p'))
-        CODT = CODT.apply(lambda x: datetime.datetime.strptime(x, r'%m/%d/%Y %I:%M %p'))
-        PAY_PERIOD = str(CIDT.min().date()) + ' - ' + str(CIDT.max().date())
-        # add python-format datetime to the dataframe
-        df['CIDT'] = CIDT
-        df['CODT'] = CODT
-    except:
-        raise RuntimeError("Cannot convert date and time to Python's own format.")
-    # Check for overlapping shifts
-    err_string = ""
-    for name in df.Name.unique():
-        err_string = err_string + check_shift_overlap(df, name)
-    if err_string != "":
-        raise ValueError(err_string)
-    # Check for unsual overnight shifts
-    err_string = err_string + check_unusual_overnight(df)
-    if err_string != "":
-        raise ValueError(err_string)
-    # Split shifts that span two days
-    new_rows = []
-    # loop through each row of the original dataframe
-    for index, row in df.iterrows():
-        # check if CIDT is on the same date as CODT
-        if row['CIDT'].weekday() != row['CODT'].weekday():
-            # create a new row for the portion of the shift that occurred on Sunday
-            first_day_row = row.copy()
-            first_day_row['CODT'] = pd.to_datetime(str(row['CODT'].date()) + ' 00:00:00')
-            new_rows.append(first_day_row)
-            # create a new row for the portion of the shift that occurred on Monday
-            second_day_row = row.copy()
-            second_day_row['CIDT'] = pd.to_datetime(str(row['CODT'].date()) + ' 00:00:00')
-            new_rows.append(second_day_row)
-        else:
-            new_rows.append(row)
-    # create a new dataframe from the modified rows
-    new_df = pd.DataFrame(new_rows)
-    # sort the new dataframe by CIDT
-    new_df = new_df.sort_values(by=['CIDT'])
-    # reset the index of the new dataframe
-    new_df = new_df.reset_index(drop=True)
-    new_df['Check-In Date'] = new_df['CIDT'].apply(lambda x: x.strftime('%m/%d/%Y'))
-    new_df['Check-In Time'] = new_df['CIDT'].apply(lambda x: x.strftime('%I:%M %p'))
-    new_df['Check-Out Date'] = new_df['CODT'].apply(lambda x: x.strftime('%m/%d/%Y'))
-    new_df['Check-Out Time'] = new_df['CODT'].apply(lambda x: x.strftime('%I:%M %p'))
-    new_df['Min. Worked'] = ((new_df['CODT'] - new_df['CIDT']).dt.total_seconds() / 60).round(2)
-    df = new_df
-    df['Shift_original'] = df['Shift']
-    #filters out shifts of type "Adaptive Behavior Treatment" since Nova doesn't pay for those
-    #df = df.loc[~df['Shift'].str.contains('Adaptive Behavior Treatment')]
-    df['Shift'] = df['Shift'].replace({'Training-HSS': 'HSS1', 'Training-RBT': 'BST1'})
-    #drop staff worked duration
-    df = df.drop('Staff Worked Duration (Minutes)', axis=1)
-    return (df, PAY_PERIOD, start_date, end_date)
+    return _read_shift_record(shift_record_path, selected_name)
 
 def read_old_tracker(old_tracker_path, start_date):
     '''
@@ -563,23 +713,24 @@ def read_old_tracker(old_tracker_path, start_date):
      
     return pandas dataframes: manager_rates, non_manager_rates, staff_info, accrued_hrs, bonus_df, prepaid_last_time, unpaid_last_time
     '''
-    #read tabs in the spreadsheet
-    manager_rates = pd.read_excel(old_tracker_path, sheet_name="MANAGER INFO")
-    non_manager_rates = pd.read_excel(old_tracker_path, sheet_name="SHIFT INFO")
-    staff_info = pd.read_excel(old_tracker_path, sheet_name="STAFF INFO")
-    accrued_hrs = pd.read_excel(old_tracker_path, sheet_name="HRS & ACCRUALS")
+    #read tabs in the spreadsheet (the workbook is parsed once and cached until it is re-uploaded)
+    tracker = read_workbook(old_tracker_path)
+    manager_rates = tracker["MANAGER INFO"]
+    non_manager_rates = tracker["SHIFT INFO"]
+    staff_info = tracker["STAFF INFO"]
+    accrued_hrs = tracker["HRS & ACCRUALS"]
     accrued_hrs = accrued_hrs.fillna(0)
     #transformed bonus_df, per_person_bonus_list, original_bonus_df
-    bonus_df = bonus = original_bonus_df = pd.read_excel(old_tracker_path, sheet_name='NEW PTO & BONUS INFO') 
-    prepaid_last_time = pd.read_excel(old_tracker_path, sheet_name='IGNORE! (Prepaid Shifts)')  
-    unpaid_last_time = pd.read_excel(old_tracker_path, sheet_name='IGNORE! (Next Period Shifts)')
+    bonus_df = bonus = original_bonus_df = tracker['NEW PTO & BONUS INFO'] 
+    prepaid_last_time = tracker['IGNORE! (Prepaid Shifts)']  
+    unpaid_last_time = tracker['IGNORE! (Next Period Shifts)']
     #Staff info formatting.
     staff_info['Days Elapsed Since Hire Date'] = staff_info['Hire Date'].apply(lambda x: max(0, (start_date - x).days))
     staff_info['Hire Date'] = staff_info['Hire Date'].apply(lambda x: x.date())
     manager_rates['Days Elapsed Since Hire Date'] = manager_rates['Hire Date'].apply(lambda x: max(0, (start_date - x).days))
     manager_rates['Hire Date'] = manager_rates['Hire Date'].apply(lambda x: x.date())
     # Admin/Sick/Vacay Wage
-    cd_non_manager_rates = deepcopy(non_manager_rates[~non_manager_rates['Shift'].str.contains('-Not-Worked')])
+    cd_non_manager_rates = deepcopy(non_manager_rates[~non_manager_rates['Shift'].str.contains('-Not-Worked', regex=False)])
     cd_non_manager_rates['Shift'] = cd_non_manager_rates['Shift'].str.replace('-Worked$', '', regex=True)
     stf_info2 = deepcopy(staff_info)
     schedule_columns = [col for col in stf_info2.columns if col.startswith("# ")]
@@ -593,18 +744,13 @@ def read_old_tracker(old_tracker_path, start_date):
     unique_levels = pd.unique(list(bst_levels) + list(oa_levels) + list(hss_levels))
     # Remove empty string from unique levels
     unique_levels = [level for level in unique_levels if level != '']
-    # Create new columns based on unique levels
+    # Create new columns based on unique levels, holding the employee's count for that level
+    # (BST is checked before OA, and OA before HSS) and 0 otherwise
+    counts = [stf_info2['# BST'].to_numpy(), stf_info2['# OA'].to_numpy(), stf_info2['# HSS'].to_numpy()]
     for level in unique_levels:
-        stf_info2[level] = 0
-    # Set the value of the respective level column to 1 if the employee has that level
-    for index, row in stf_info2.iterrows():
-        for level in unique_levels:
-            if row['BST Level'] == level:
-                stf_info2.loc[index, level] = row['# BST']
-            elif row['OA Level'] == level:
-                stf_info2.loc[index, level] = row['# OA']
-            elif row['HSS Level'] == level:
-                stf_info2.loc[index, level] = row['# HSS']
+        has_level = [stf_info2['BST Level'].eq(level).to_numpy(), stf_info2['OA Level'].eq(level).to_numpy(),
+                     stf_info2['HSS Level'].eq(level).to_numpy()]
+        stf_info2[level] = np.select(has_level, counts, default=0)
     # Remove the original BST Level, OA Level, and HSS Level columns and create a new dataframe
     stf_info2 = stf_info2.drop(['BST Level', 'OA Level', 'HSS Level', '# HSS', '# BST', '# OA', 'Hire Date', 
                                 'Accrual Rate', 'Days Elapsed Since Hire Date', 'Admin/Sick/Vacay Wage', 'Reimbursable Mileage', 'Expense Reimbursement'], axis=1)
@@ -612,55 +758,53 @@ def read_old_tracker(old_tracker_path, start_date):
     stf_info2.columns = stf_info2.columns.str.strip()
     stf_info2 = stf_info2.fillna(0)
     stf_info2 = stf_info2.replace(r'^\s*$', 0, regex=True)
-    avs_wage = [] #average wage 
-    #Calculate regular rate.
-    for index, row in stf_info2.iterrows():
-        sum_total = 0
-        total_hrs = 0
-        for shift_name, value in row[1:].items():
-            sum_total += value * cd_non_manager_rates.loc[cd_non_manager_rates.Shift == shift_name]['BOT Hourly Wage'].iloc[0]
-            total_hrs += value
-        avs_wage.append(sum_total/total_hrs)
-    staff_info['Admin/Sick/Vacay Wage'] = avs_wage
+    #Calculate regular rate: the average BOT wage weighted by the counts of each shift.
+    #(columns are accumulated one at a time, in the same order as the per-row sums were)
+    shift_columns = stf_info2.columns[1:]
+    bot_wages = cd_non_manager_rates.drop_duplicates('Shift').set_index('Shift')['BOT Hourly Wage']
+    missing = [shift_name for shift_name in shift_columns if shift_name not in bot_wages.index]
+    if missing:
+        raise ValueError(f"Cannot find the BOT Hourly Wage of {', '.join(missing)} in the SHIFT INFO tab.")
+    sum_total = np.zeros(len(stf_info2))
+    total_hrs = np.zeros(len(stf_info2))
+    for shift_name in shift_columns:
+        values = stf_info2[shift_name].to_numpy(dtype=float)
+        sum_total = sum_total + values * bot_wages[shift_name]
+        total_hrs = total_hrs + values
+    #average wage (staff without shift counts yet, e.g. new hires, get NaN)
+    staff_info['Admin/Sick/Vacay Wage'] = sum_total / np.where(total_hrs == 0, np.nan, total_hrs)
     #Clean Bonus record 
     bonus_df = bonus_df.drop(['First Name', 'Last Name'], axis=1)
     bonus_df = bonus_df.rename(columns={'Full Name': 'Name'})
-    bonus = pd.DataFrame(columns=["Name", "Date", "Bonus Amount"])
-    for index, row in bonus_df.iterrows():
-        for bon_num in ['Bonus 1', 'Bonus 2', 'Bonus 3', 'Bonus 4']:
-            if np.isnan(row[bon_num]) == False:
-                name = row['Name']
-                date = row[bon_num+' Date']
-                amount = row[bon_num]
-                bonus = bonus.append({"Name": name, "Date": date, "Bonus Amount": amount},ignore_index=True)
+    # one row per bonus given, person by person (Bonus 1 to 4)
+    amount_columns = ['Bonus 1', 'Bonus 2', 'Bonus 3', 'Bonus 4']
+    date_columns = ['Bonus 1 Date', 'Bonus 2 Date', 'Bonus 3 Date', 'Bonus 4 Date']
+    bonus = pd.DataFrame({"Name": np.repeat(bonus_df['Name'].to_numpy(), len(amount_columns)),
+                          "Date": bonus_df[date_columns].to_numpy().ravel(),
+                          "Bonus Amount": bonus_df[amount_columns].to_numpy().ravel()})
+    bonus = bonus[bonus['Bonus Amount'].notna()].reset_index(drop=True)
     # Format bonus dataframe
-    bonus_df['Premium Pay 1 Check-In Time'] = pd.to_datetime(bonus_df['Premium Pay 1 Check-In Time'], format='%H:%M:%S').dt.time
-    bonus_df['Premium Pay 2 Check-In Time'] = pd.to_datetime(bonus_df['Premium Pay 2 Check-In Time'], format='%H:%M:%S').dt.time
-    bonus_df['Premium Pay 3 Check-In Time'] = pd.to_datetime(bonus_df['Premium Pay 3 Check-In Time'], format='%H:%M:%S').dt.time
-    bonus_df['Premium Pay 4 Check-In Time'] = pd.to_datetime(bonus_df['Premium Pay 4 Check-In Time'], format='%H:%M:%S').dt.time
-    # Combine Check-In Date and Check-In Time into Check-In Datetime
-    bonus_df['Premium Pay 1 Check-In Datetime'] = pd.to_datetime(bonus_df['Premium Pay 1 Check-In Date']) + pd.to_timedelta(bonus_df['Premium Pay 1 Check-In Time'].astype(str))
-    bonus_df['Premium Pay 2 Check-In Datetime'] = pd.to_datetime(bonus_df['Premium Pay 2 Check-In Date']) + pd.to_timedelta(bonus_df['Premium Pay 2 Check-In Time'].astype(str))
-    bonus_df['Premium Pay 3 Check-In Datetime'] = pd.to_datetime(bonus_df['Premium Pay 3 Check-In Date']) + pd.to_timedelta(bonus_df['Premium Pay 3 Check-In Time'].astype(str))
-    bonus_df['Premium Pay 4 Check-In Datetime'] = pd.to_datetime(bonus_df['Premium Pay 4 Check-In Date']) + pd.to_timedelta(bonus_df['Premium Pay 4 Check-In Time'].astype(str))
-    bonus_df['Premium Pay 1 Check-Out Time'] = pd.to_datetime(bonus_df['Premium Pay 1 Check-Out Time'], format='%H:%M:%S').dt.time
-    bonus_df['Premium Pay 2 Check-Out Time'] = pd.to_datetime(bonus_df['Premium Pay 2 Check-Out Time'], format='%H:%M:%S').dt.time
-    bonus_df['Premium Pay 3 Check-Out Time'] = pd.to_datetime(bonus_df['Premium Pay 3 Check-Out Time'], format='%H:%M:%S').dt.time
-    bonus_df['Premium Pay 4 Check-Out Time'] = pd.to_datetime(bonus_df['Premium Pay 4 Check-Out Time'], format='%H:%M:%S').dt.time
-    # Combine Check-Out Date and Check-Out Time into Check-Out Datetime
-    bonus_df['Premium Pay 1 Check-Out Datetime'] = pd.to_datetime(bonus_df['Premium Pay 1 Check-Out Date']) + pd.to_timedelta(bonus_df['Premium Pay 1 Check-Out Time'].astype(str))
-    bonus_df['Premium Pay 2 Check-Out Datetime'] = pd.to_datetime(bonus_df['Premium Pay 2 Check-Out Date']) + pd.to_timedelta(bonus_df['Premium Pay 2 Check-Out Time'].astype(str))
-    bonus_df['Premium Pay 3 Check-Out Datetime'] = pd.to_datetime(bonus_df['Premium Pay 3 Check-Out Date']) + pd.to_timedelta(bonus_df['Premium Pay 3 Check-Out Time'].astype(str))
-    bonus_df['Premium Pay 4 Check-Out Datetime'] = pd.to_datetime(bonus_df['Premium Pay 4 Check-Out Date']) + pd.to_timedelta(bonus_df['Premium Pay 4 Check-Out Time'].astype(str))
-    # Get duration
-    bonus_df['Premium Pay 1 Duration'] = pd.to_datetime(bonus_df['Premium Pay 1 Check-Out Datetime']) - pd.to_datetime(bonus_df['Premium Pay 1 Check-In Datetime'])
-    bonus_df['Premium Pay 2 Duration'] = pd.to_datetime(bonus_df['Premium Pay 2 Check-Out Datetime']) - pd.to_datetime(bonus_df['Premium Pay 2 Check-In Datetime'])
-    bonus_df['Premium Pay 3 Duration'] = pd.to_datetime(bonus_df['Premium Pay 3 Check-Out Datetime']) - pd.to_datetime(bonus_df['Premium Pay 3 Check-In Datetime'])
-    bonus_df['Premium Pay 4 Duration'] = pd.to_datetime(bonus_df['Premium Pay 4 Check-Out Datetime']) - pd.to_datetime(bonus_df['Premium Pay 4 Check-In Datetime'])
+    # Parse the check-in/out times into timedeltas since midnight (kept as timedelta64, no Python time objects)
+    for n in range(1, 5):
+        for time_col in [f'Premium Pay {n} Check-In Time', f'Premium Pay {n} Check-Out Time']:
+            parsed = pd.to_datetime(bonus_df[time_col], format='%H:%M:%S')
+            bonus_df[time_col] = parsed - parsed.dt.normalize()
+    # Combine Check-In/Check-Out Date and Time into Check-In/Check-Out Datetime
+    # (each date column is parsed once; the dates repeat a lot, so the parse is cached)
+    for side in ['Check-In', 'Check-Out']:
+        for n in range(1, 5):
+            dates = pd.to_datetime(bonus_df[f'Premium Pay {n} {side} Date'], cache=True)
+            bonus_df[f'Premium Pay {n} {side} Datetime'] = dates + bonus_df[f'Premium Pay {n} {side} Time']
+    # Get duration (both datetimes are already datetime64)
+    bonus_df['Premium Pay 1 Duration'] = bonus_df['Premium Pay 1 Check-Out Datetime'] - bonus_df['Premium Pay 1 Check-In Datetime']
+    bonus_df['Premium Pay 2 Duration'] = bonus_df['Premium Pay 2 Check-Out Datetime'] - bonus_df['Premium Pay 2 Check-In Datetime']
+    bonus_df['Premium Pay 3 Duration'] = bonus_df['Premium Pay 3 Check-Out Datetime'] - bonus_df['Premium Pay 3 Check-In Datetime']
+    bonus_df['Premium Pay 4 Duration'] = bonus_df['Premium Pay 4 Check-Out Datetime'] - bonus_df['Premium Pay 4 Check-In Datetime']
     duration_columns = ['Premium Pay 1 Duration', 'Premium Pay 2 Duration', 'Premium Pay 3 Duration', 'Premium Pay 4 Duration']
     bonus_df[duration_columns] = bonus_df[duration_columns].fillna(pd.Timedelta(0))
-    bonus_df['Premium Pay Hours'] = (
-        bonus_df['Premium Pay 1 Duration'] + bonus_df['Premium Pay 2 Duration'] + bonus_df['Premium Pay 3 Duration'] + bonus_df['Premium Pay 4 Duration']).dt.total_seconds()/3600
+    # add the four durations in one pass over the block
+    total_duration = bonus_df[duration_columns].to_numpy(dtype='timedelta64[ns]').sum(axis=1)
+    bonus_df['Premium Pay Hours'] = pd.Series(total_duration, index=bonus_df.index).dt.total_seconds()/3600
     return (manager_rates, non_manager_rates, accrued_hrs, bonus_df, bonus, original_bonus_df, staff_info, prepaid_last_time, unpaid_last_time)
 
 def merge_shifts(df, staff_info, manager_rates, non_manager_rates):
@@ -675,34 +819,47 @@ def merge_shifts(df, staff_info, manager_rates, non_manager_rates):
     return merged datafarme df_shift_merged
     '''
     #Convert RBT to BST
-    for _, row in df.iterrows():
-        if row['Shift'] == 'RBT':
-            name = row['Name']
-            matching_row = staff_info[staff_info['Name'] == name]
-            if len(matching_row) != 1:
+    is_rbt = df['Shift'] == 'RBT'
+    if is_rbt.any():
+        rbt_names = df.loc[is_rbt, 'Name']
+        # each RBT shift needs exactly one staff info row with a BST level
+        matches = rbt_names.map(staff_info['Name'].value_counts()).fillna(0)
+        bst_level = rbt_names.map(staff_info.drop_duplicates('Name').set_index('Name')['BST Level'])
+        invalid = (matches != 1) | bst_level.isna()
+        if invalid.any():
+            first = invalid.idxmax() # report the first problem shift
+            name = rbt_names[first]
+            if matches[first] != 1:
                 raise ValueError(f"Error: Multiple or no matching rows found for Name '{name}' in staff info.")
-            else:
-                if pd.isna(matching_row['BST Level'].values[0]) == False:
-                    df.loc[_, 'Shift'] = matching_row['BST Level'].values[0]
-                else:
-                    raise ValueError(f"Error: RBT is not equal to 1 for Name '{name}' in other_rates.")
-    df_shift_merged = pd.merge(df, non_manager_rates, how='left', on='Shift')
-    for name, accrued in zip(manager_rates['Name'], manager_rates['Accrual Rate']):
-        df_shift_merged.loc[(df_shift_merged['Name'] == name), ['Accrual Rate']] = accrued
+            raise ValueError(f"Error: RBT is not equal to 1 for Name '{name}' in other_rates.")
+        df.loc[is_rbt, 'Shift'] = bst_level
+    # join against the indexed rates (each shift has to be listed once)
+    if not non_manager_rates['Shift'].is_unique:
+        raise ValueError("Some shifts are listed more than once in the SHIFT INFO tab of the old tracker.")
+    df_shift_merged = df.join(non_manager_rates.set_index('Shift'), on='Shift', how='left').reset_index(drop=True)
+    # managers accrue at their own rate (the last row wins if a manager is listed twice)
+    manager_accrual = manager_rates.drop_duplicates('Name', keep='last').set_index('Name')['Accrual Rate']
+    is_mgr = df_shift_merged['Name'].isin(manager_accrual.index)
+    if is_mgr.any():
+        df_shift_merged.loc[is_mgr, 'Accrual Rate'] = df_shift_merged.loc[is_mgr, 'Name'].map(manager_accrual)
     #include Admin Wage
-    admin_shifts = df_shift_merged[df_shift_merged['Shift'] == 'Admin']
+    is_admin = df_shift_merged['Shift'] == 'Admin'
+    admin_shifts = df_shift_merged[is_admin]
     admin_names = admin_shifts['Name'].tolist()
     # Filter the rows in other_rates where the NAME column matches the names of the Service Providers in the Admin shifts
     admin_rates = staff_info[staff_info['Name'].isin(admin_names)]
     # Merge the Admin rates back into the Admin shifts dataframe
     if len(admin_names)>0:
-        admin_shifts_merged = pd.merge(admin_shifts, admin_rates, on='Name', how='left')
+        if not admin_rates['Name'].is_unique:
+            raise ValueError("Some staff with Admin shifts are listed more than once in the STAFF INFO tab of the old tracker.")
+        admin_shifts_merged = admin_shifts.join(admin_rates.set_index('Name'), on='Name', how='left',
+                                                lsuffix='_x', rsuffix='_y').reset_index(drop=True)
         # Fill the Regular Hourly Wage and Overtime Hourly Wage columns with the values from the ADMIN/VACAY WAGE column
-        admin_shifts_merged.loc[:, 'Regular Hourly Wage'] = admin_shifts_merged['Admin/Sick/Vacay Wage']
-        admin_shifts_merged.loc[:, 'BOT Hourly Wage'] = admin_shifts_merged['Admin/Sick/Vacay Wage']
-        admin_shifts_merged.loc[:, 'Accrual Rate'] = 0.04
-        df_shift_merged = df_shift_merged[df_shift_merged['Shift'] != 'Admin']
-        df_shift_merged = pd.concat([df_shift_merged, admin_shifts_merged], ignore_index=True)
+        admin_wage = admin_shifts_merged['Admin/Sick/Vacay Wage']
+        admin_shifts_merged = admin_shifts_merged.assign(**{'Regular Hourly Wage': admin_wage, 'BOT Hourly Wage': admin_wage,
+                                                            'Accrual Rate': 0.04})
+        # Admin shifts go after the other shifts, with the STAFF INFO columns they were joined with
+        df_shift_merged = pd.concat([df_shift_merged[~is_admin], admin_shifts_merged], ignore_index=True)
         columns_to_remove = [col for col in df_shift_merged.columns if col.startswith("# ")] + ['Billing Rates', 'Accrual Rate_x', 
                                                                                                 'Hire Date', 'BST Level', 'HSS Level', 
                                                                                                 'OA Level', 'Accrual Rate_y',
@@ -720,20 +877,17 @@ def calc_time_off(df_shift_merged):
     '''
     #time off
     all_names = df_shift_merged['Name'].drop_duplicates()
-    #sick leave
-    sick_shift_sum = df_shift_merged[df_shift_merged['Shift'] == 'Sick'].groupby('Name')['Min. Worked'].sum().reset_index()
-    sick_shift_sum = all_names.to_frame().merge(sick_shift_sum, on='Name', how='left').fillna(0)
-    sick_shift_sum = sick_shift_sum.rename(columns={'Min. Worked': 'Sick Hrs'})
-    sick_shift_sum['Sick Hrs'] = sick_shift_sum['Sick Hrs']/60
-    #vacation cash-out
-    vac_shift_sum = df_shift_merged[df_shift_merged['Shift'] == 'Vacation'].groupby('Name')['Min. Worked'].sum().reset_index()
-    vac_shift_sum = all_names.to_frame().merge(vac_shift_sum, on='Name', how='left').fillna(0)
-    vac_shift_sum = vac_shift_sum.rename(columns={'Min. Worked': 'Vac Hrs'})
-    vac_shift_sum['Vac Hrs'] = vac_shift_sum['Vac Hrs']/60
-    time_off = vac_shift_sum.merge(sick_shift_sum, on='Name')
+    is_sick = df_shift_merged['Shift'] == 'Sick'
+    is_vac = df_shift_merged['Shift'] == 'Vacation'
+    is_time_off = is_sick | is_vac
+    # sick leave and vacation cash-out hours per person, summed in one groupby
+    time_off_minutes = df_shift_merged[is_time_off].groupby(['Name', 'Shift'])['Min. Worked'].sum().unstack('Shift')
+    time_off_minutes = time_off_minutes.reindex(index=all_names, columns=['Vacation', 'Sick']).fillna(0)
+    time_off = pd.DataFrame({'Name': all_names.to_numpy(), 'Vac Hrs': time_off_minutes['Vacation'].to_numpy()/60,
+                             'Sick Hrs': time_off_minutes['Sick'].to_numpy()/60})
     #time_off_as_shifts is a subset of df_shift_merged with only Sick and Vacation in there.
-    time_off_as_shifts = df_shift_merged[((df_shift_merged['Shift'] == 'Sick') | (df_shift_merged['Shift'] == 'Vacation'))]
-    df_shift_merged = df_shift_merged[~((df_shift_merged['Shift'] == 'Sick') | (df_shift_merged['Shift'] == 'Vacation'))]
+    time_off_as_shifts = df_shift_merged[is_time_off]
+    df_shift_merged = df_shift_merged[~is_time_off]
     return (df_shift_merged, time_off, time_off_as_shifts)
 
 def crop_shifts(df, start_date, end_date):
@@ -747,40 +901,23 @@ def crop_shifts(df, start_date, end_date):
     '''
     # get shifts that wil be paid in the next pay period
     #To be paid Next period:
-    df_after_pay_period = deepcopy(df[df['CIDT'] >= end_date])
+    df_after_pay_period = df[df['CIDT'] >= end_date].copy()
     # Filter the DataFrame based on the time duration
     df = df[(df['CIDT'] >= start_date) & (df['CIDT'] < end_date)]
     if len(df) == 0:
         return(df, df_after_pay_period, pd.DataFrame(columns=df.columns),[str(start_date.date())], False)
     ### get shifts that wil be prepaid in this pay cycle (belong to this pay cycle, but falls under the last partial week)
-    week_dataframes = split_by_work_week(df)
-    week_order = []
-    full_week = []
-    for week_start, week_df in week_dataframes.items():
-        week_order.append(week_start)
-        # Get the first and last day of the week
-        week_start_day = week_df['CIDT'].min().weekday()
-        week_end_day = week_df['CIDT'].max().weekday()
-        # Check if the week contains observations for every day from Mon to Sun
-        if week_end_day - week_start_day == 6:
-            full_week.append(True)
-        else:
-            full_week.append(False)
-    week_df = pd.DataFrame({"week": week_order, "full week": full_week})
-    # Convert the "week" column to datetime objects
-    week_df['week_dt'] = pd.to_datetime(week_df['week'])
-    # Sort the rows by the values in the "week" column
-    week_df = week_df.sort_values('week_dt')
-    # Drop the first week from week_df if it's not a full week
-    if (not week_df.iloc[0]['full week']) and (len(week_dataframes) > 1) :
-        # Get the key corresponding to the first row's "week" value
-        key_to_drop = week_df.iloc[0]['week']
-        # Drop the item with the corresponding key from week_dataframes
-        week_dataframes.pop(key_to_drop)
-    PREPAY = (week_df.iloc[-1]['full week']==False) # partial week or full week
+    # Bucket shifts by work week (keyed by Monday, as in split_by_work_week) without building a dataframe per week
+    week_key = df['CIDT'].dt.normalize() - pd.to_timedelta(df['CIDT'].dt.weekday, unit='D')
+    weeks = pd.date_range(week_key.min(), week_key.max(), freq='7D')
+    week_order = list(weeks.strftime('%Y-%m-%d'))
+    # A week is full if it has observations from Mon to Sun (weeks without shifts are not)
+    week_span = df['CIDT'].groupby(week_key).agg(['min', 'max'])
+    full_week = (week_span['max'].dt.weekday - week_span['min'].dt.weekday == 6).reindex(weeks, fill_value=False)
+    PREPAY = not full_week.iloc[-1] # partial week or full week
     prepaid_hours = pd.DataFrame(columns=df.columns)
     if PREPAY:
-        prepaid_hours = deepcopy(week_dataframes[week_df.iloc[-1]['week']])
+        prepaid_hours = split_by_work_week(df[week_key == weeks[-1]])[week_order[-1]]
     return (df, df_after_pay_period, prepaid_hours, week_order, PREPAY)
 
 def non_manager_payroll(non_mgr, df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, staff_info, week_order, prepaid_last_time, PAY_PERIOD, new_accrued_hrs):   
@@ -802,94 +939,98 @@ def non_manager_payroll(non_mgr, df_shift_merged, accrued_hrs, bonus_df, bonus,
     #Create a list that stores the payroll dictionary
     non_mgr_payroll = []
     #For each non-manager
-    df_shift_merged = deepcopy(df_shift_merged)
+    df_shift_merged = df_shift_merged.copy()
     # name update
     df_shift_merged['Shift'] = df_shift_merged['Shift'].replace({'Training-HSS': 'HSS1', 'Training-RBT': 'BST1'})
     if len(prepaid_last_time) > 0: #who are prepaid last time?
         prepaid_ppl = prepaid_last_time['Name'].unique()
     else:
         prepaid_ppl = set()
+    #set aggregation rule (per person and shift)
+    aggregations = {'Min. Worked': 'sum', 'Regular Hourly Wage': 'first'}
+    #Aggregate payroll data summarizing total time worked for each shift, for everyone in one groupby
+    shift_totals = df_shift_merged.groupby(['Name', 'Shift'])[['Min. Worked', 'Regular Hourly Wage']].agg(aggregations).reset_index()
+    shift_totals = shift_totals[['Shift', 'Min. Worked', 'Regular Hourly Wage', 'Name']]
+    # rows of each person, grouped once for the loop below
+    shift_total_rows = group_rows_by(shift_totals, 'Name')
+    prepaid_rows = group_rows_by(prepaid_last_time, 'Name')
+    time_off_rows = group_rows_by(time_off, 'Name')
+    bonus_rows = group_rows_by(bonus, 'Name')
+    premium_rows = group_rows_by(bonus_df, 'Name')
+    accrued_rows = group_rows_by(accrued_hrs, 'Staff')
+    accrued_frames = []
+    staff_rows = group_rows_by(staff_info, 'Name')
+    # worked shifts (not '-Not-Worked') are picked out once for everyone
+    df_worked = df_shift_merged[~df_shift_merged['Shift'].str.contains('-Not-Worked', regex=False)]
+    worked_minutes = worked_minutes_by_name(df_worked)
+    # holiday extra pay (at half the BOT wage) of everyone, aggregated by person and shift in one groupby
+    df_holiday = df_worked[df_worked['Holiday Worked Duration (Minutes)'] != 0] # with holiday overlap
+    holiday_pay = pd.DataFrame({'Name': df_holiday['Name'], 'Shift': df_holiday['Shift'] + ' Holiday Extra Pay',
+                                'Min. Worked': df_holiday['Holiday Worked Duration (Minutes)'],
+                                'Regular Hourly Wage': (df_holiday['BOT Hourly Wage']*0.5).round(2)})
+    holiday_pay = holiday_pay.groupby(['Name', 'Shift']).agg(aggregations).reset_index()
+    holiday_rows = group_rows_by(holiday_pay[['Shift', 'Min. Worked', 'Regular Hourly Wage', 'Name']], 'Name')
+    # weekly overtime of all non-managers, computed in one pass
+    overtime_rows = group_rows_by(weekly_overtime_by_name(df_shift_merged, non_mgr, prepaid_last_time, week_order[0]), 'Name')
     for _, name in enumerate(non_mgr):
-        #subset to the individual's shift
-        df_indiv = df_shift_merged.loc[df_shift_merged['Name'] == name]
-        regular_rate = staff_info.loc[staff_info['Name'] == name]['Admin/Sick/Vacay Wage'].iloc[0]
-        #set aggregation rule
-        aggregations = {'Min. Worked': 'sum', 'Regular Hourly Wage': 'first', 'Name': 'first'}
-        #Aggregate payroll data summarizing total time worked for each shift
-        df_payroll = df_indiv[['Shift', 'Min. Worked', 'Regular Hourly Wage', 'Name']]
-        df_payroll = df_payroll.groupby('Shift').agg(aggregations)
-        df_payroll = df_payroll.reset_index()
+        #the individual's time worked for each shift
+        df_payroll = shift_total_rows(name)
+        # the person's staff info, read off once
+        staff = staff_rows(name).iloc[0]
+        regular_rate = staff['Admin/Sick/Vacay Wage']
+        # rows are collected in a list and concatenated once
+        payroll_pieces = [df_payroll]
         #Calculate total hours worked
-        df_indiv_worked = df_indiv[~df_indiv['Shift'].str.contains('-Not-Worked')]
-        total_hours_worked = round(df_indiv_worked['Min. Worked'].sum()/60, 2)
+        minutes_worked, holiday_work_time = worked_minutes(name)
+        total_hours_worked = round(minutes_worked/60, 2)
         #Dealing with holiday
-        if df_indiv_worked['Holiday Worked Duration (Minutes)'].sum() > 0:
-            df_holiday_pay = df_indiv_worked[['Name', 'Shift', 'Holiday Worked Duration (Minutes)', 'BOT Hourly Wage']] # filter
-            df_holiday_pay = df_holiday_pay[df_holiday_pay['Holiday Worked Duration (Minutes)'] != 0] # with holiday overlap
-            df_holiday_pay['Shift'] = df_holiday_pay['Shift'].apply(lambda x: x + ' Holiday Extra Pay') # rename cols
-            df_holiday_pay['Regular Hourly Wage'] = (df_holiday_pay['BOT Hourly Wage']*0.5).round(2) #halve the wage for extra pay
-            df_holiday_pay = df_holiday_pay.rename(columns={'Holiday Worked Duration (Minutes)': 'Min. Worked'})
-            df_holiday_pay = df_holiday_pay.drop('BOT Hourly Wage', axis=1)
-            df_holiday_pay = df_holiday_pay.groupby('Shift').agg(aggregations)
-            df_holiday_pay = df_holiday_pay.reset_index()
-            df_payroll= pd.concat([df_payroll, df_holiday_pay], ignore_index=True)
-        #Dealing with weekly overtime pay
-        df_weeks = split_by_work_week(df_indiv)
-        for key in df_weeks.keys(): #each key is a timestamp
-            df_weekly = deepcopy(df_weeks[key])
-            if (key == week_order[0]) and (name in prepaid_ppl): #first week and prepaid
-                df_weekly = pd.concat([prepaid_last_time.loc[prepaid_last_time.Name == name], df_weekly], ignore_index=True)
-            df_weekly_worked = df_weekly[~df_weekly['Shift'].str.contains('-Not-Worked')]
-            weekly_hours_worked = round(df_weekly_worked['Min. Worked'].sum()/60, 2)
-            weekly_hours_paid = round(df_weekly['Min. Worked'].sum()/60, 2)
-            overtime_hours = max(0, weekly_hours_worked-40)
-            ot_rate =((df_weekly['BOT Hourly Wage']*(df_weekly['Min. Worked']/60).round(2)).sum()/weekly_hours_paid)
-            if overtime_hours > 0:
-                #Calculate BOT rate
-                df_overtime = pd.DataFrame({'Name': name, 'Shift': [f'OT Extra Pay ({key})'], 'Min. Worked': [overtime_hours*60], 
-                                            'Regular Hourly Wage': [round(ot_rate/2, 2)]})
-                #Add to payroll
-                df_payroll= pd.concat([df_payroll, df_overtime], ignore_index=True)
+        if holiday_work_time > 0:
+            payroll_pieces.append(holiday_rows(name))
+        #Dealing with weekly overtime pay (one row per week with overtime, at half the BOT rate)
+        weekly_ot = overtime_rows(name)
+        if len(weekly_ot) > 0:
+            df_overtime = pd.DataFrame({'Name': name, 'Shift': ('OT Extra Pay (' + weekly_ot['Week'] + ')').to_numpy(),
+                                        'Min. Worked': (weekly_ot['Overtime Hours']*60).to_numpy(),
+                                        'Regular Hourly Wage': (weekly_ot['OT Rate']/2).round(2).to_numpy()})
+            #Add to payroll
+            payroll_pieces.append(df_overtime)
         # Format df_payroll
+        df_payroll = pd.concat(payroll_pieces, ignore_index=True)
         df_payroll = df_payroll.rename(columns={'Regular Hourly Wage': 'Wage'})
         df_payroll['Min. Worked'] = pd.to_numeric(df_payroll['Min. Worked'], errors='coerce')
         df_payroll['Hrs. Worked'] = (df_payroll['Min. Worked']/60).round(2)
         df_payroll = df_payroll.reindex(columns=['Name', 'Shift', 'Min. Worked', 'Hrs. Worked',  'Wage'])
-        pay_period_sick_time = time_off.loc[time_off['Name']== name]['Sick Hrs'].sum()
-        pay_period_vac_time = time_off.loc[time_off['Name']== name]['Vac Hrs'].sum()
+        # the extra one-row entries are collected as dicts and added as one dataframe
+        extra_rows = []
+        pay_period_sick_time = time_off_rows(name)['Sick Hrs'].sum()
+        pay_period_vac_time = time_off_rows(name)['Vac Hrs'].sum()
         #paid vacation and sick leave
-        if name in list(time_off['Name']):
+        if len(time_off_rows(name)) > 0:
             if pay_period_sick_time > 0:
                 #this is hourly wage for sick cash out
                 sick_amount = regular_rate
-                df_sick = pd.DataFrame({'Name': name, 'Shift': ['Sick Leave Used'], 'Min. Worked': [60*pay_period_sick_time], 
-                                        'Hrs. Worked':[pay_period_sick_time],
-                                        'Wage': [sick_amount]})
-                df_payroll= pd.concat([df_payroll, df_sick], ignore_index=True)
+                extra_rows.append({'Name': name, 'Shift': 'Sick Leave Used', 'Min. Worked': 60*pay_period_sick_time, 
+                                   'Hrs. Worked': pay_period_sick_time, 'Wage': sick_amount})
             if pay_period_vac_time > 0:
                 vac_amount = regular_rate
-                df_vac = pd.DataFrame({'Name': name, 'Shift': ['Vacation Payout'], 'Min. Worked': [60*pay_period_vac_time], 
-                                       'Hrs. Worked':[pay_period_vac_time],
-                                        'Wage': [vac_amount]})
-                df_payroll= pd.concat([df_payroll, df_vac], ignore_index=True)
+                extra_rows.append({'Name': name, 'Shift': 'Vacation Payout', 'Min. Worked': 60*pay_period_vac_time, 
+                                   'Hrs. Worked': pay_period_vac_time, 'Wage': vac_amount})
         #Add bonus
-        if name in list(bonus['Name']):
-            bonus_amount = bonus.loc[bonus['Name'] == name]['Bonus Amount'].sum()
-            df_bonus = pd.DataFrame({'Name': name, 'Shift': ['Bonus'], 'Min. Worked': [60.0], 'Hrs. Worked':[1],
-                                        'Wage': [bonus_amount]})
-            df_payroll= pd.concat([df_payroll, df_bonus], ignore_index=True)
+        if len(bonus_rows(name)) > 0:
+            bonus_amount = bonus_rows(name)['Bonus Amount'].sum()
+            extra_rows.append({'Name': name, 'Shift': 'Bonus', 'Min. Worked': 60.0, 'Hrs. Worked': 1, 'Wage': bonus_amount})
         #Add Premium Pay
-        premium_hrs = bonus_df.loc[bonus_df.Name == name]['Premium Pay Hours'].sum()
+        premium_hrs = premium_rows(name)['Premium Pay Hours'].sum()
         if premium_hrs > 0:
-            df_premium = pd.DataFrame({'Name': name, 'Shift': ['Premium Pay'], 'Min. Worked': [premium_hrs*60], 
-                                       'Hrs. Worked':[premium_hrs],
-                                        'Wage': [(1.5*regular_rate).round(2)]})
-            df_payroll= pd.concat([df_payroll, df_premium], ignore_index=True)    
+            extra_rows.append({'Name': name, 'Shift': 'Premium Pay', 'Min. Worked': premium_hrs*60, 
+                               'Hrs. Worked': premium_hrs, 'Wage': (1.5*regular_rate).round(2)})
+        if extra_rows:
+            df_payroll = pd.concat([df_payroll, pd.DataFrame(extra_rows)], ignore_index=True)
         df_payroll['Gross Wages'] = df_payroll['Hrs. Worked'] * df_payroll['Wage']
         df_payroll=df_payroll.round(decimals=2)
         total_gross_wage = df_payroll['Gross Wages'].sum()
         #accrual
-        accrued_df = deepcopy(accrued_hrs.loc[accrued_hrs.Staff == name])
+        accrued_df = accrued_rows(name).copy()
         accrued_df['YTD Vacation Taken'] += pay_period_vac_time
         accrued_df['Sick Taken'] += pay_period_sick_time
         accrued_df['YTD Hours'] += total_hours_worked
@@ -904,37 +1045,42 @@ def non_manager_payroll(non_mgr, df_shift_merged, accrued_hrs, bonus_df, bonus,
         accrued_df['YTD Vacation Accrued'] += pay_period_accrued_vac
         accrued_df['Vacation Balance'] = accrued_df['YTD Vacation Accrued'] + accrued_df['Vac. Hrs Carried Over'] - accrued_df['YTD Vacation Taken']
         accrued_df['Sick Balance'] = accrued_df['Sick Bank'] - accrued_df['Sick Taken']
-        new_accrued_hrs = pd.concat([new_accrued_hrs, accrued_df], ignore_index=True)
+        accrued_frames.append(accrued_df)
+        # the person's updated accrual figures, read off once for the summary tables
+        accrued = accrued_df.iloc[0]
         non_mgr_payroll.append({'header': pd.DataFrame(columns=[name, is_sub]), 
                                 'summary': pd.DataFrame({ 
                                     'Total Gross Wage': total_gross_wage, 
                                     'Pay Period': PAY_PERIOD}, index=[0]), 
                                     'payroll': df_payroll,
-                                    'accrued_A': pd.DataFrame({'Hrs. YTD': accrued_df['YTD Hours'].iloc[0], 
+                                    'accrued_A': pd.DataFrame({'Hrs. YTD': accrued['YTD Hours'], 
                                                                 'Hrs. Worked This Period': total_hours_worked,
-                                                                'Hire Date': staff_info.loc[staff_info.Name == name]['Hire Date'].iloc[0],
-                                                                'Calendar Days Since Hire Date': staff_info.loc[staff_info.Name == name]['Days Elapsed Since Hire Date'].iloc[0]},
+                                                                'Hire Date': staff['Hire Date'],
+                                                                'Calendar Days Since Hire Date': staff['Days Elapsed Since Hire Date']},
                                                                 index=[0]).round(decimals=2),
-                                    'accrued_B': pd.DataFrame({'Vac. Accrued YTD': accrued_df['YTD Vacation Accrued'].iloc[0], 
-                                                                'Vac. Taken YTD': accrued_df['YTD Vacation Taken'].iloc[0], 
+                                    'accrued_B': pd.DataFrame({'Vac. Accrued YTD': accrued['YTD Vacation Accrued'], 
+                                                                'Vac. Taken YTD': accrued['YTD Vacation Taken'], 
                                                                 'Vac. Accrued This Period': pay_period_accrued_vac,
                                                                 'Vac. Taken This Period': pay_period_vac_time,
-                                                                'Vac. Hrs Carried Over': accrued_df['Vac. Hrs Carried Over'].iloc[0],
-                                                                'Vac. Balance': accrued_df['Vacation Balance'].iloc[0]},index=[0]).round(decimals=2),
-                                    'accrued_C': pd.DataFrame({'Sick Bank YTD': accrued_df['Sick Bank'].iloc[0], 
-                                                                'Sick Taken YTD': accrued_df['Sick Taken'].iloc[0], 
+                                                                'Vac. Hrs Carried Over': accrued['Vac. Hrs Carried Over'],
+                                                                'Vac. Balance': accrued['Vacation Balance']},index=[0]).round(decimals=2),
+                                    'accrued_C': pd.DataFrame({'Sick Bank YTD': accrued['Sick Bank'], 
+                                                                'Sick Taken YTD': accrued['Sick Taken'], 
                                                                 'Sick Taken This Period':pay_period_sick_time,
-                                                                'Sick Balance': accrued_df['Sick Balance'].iloc[0]},index=[0]).round(decimals=2)
+                                                                'Sick Balance': accrued['Sick Balance']},index=[0]).round(decimals=2)
                                     })
+    # the updated accruals are appended to new_accrued_hrs in one concat
+    new_accrued_hrs = pd.concat([new_accrued_hrs] + accrued_frames, ignore_index=True)
     return (non_mgr_payroll, new_accrued_hrs)
 
-def manager_payroll(mgr, manager_rates, df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, week_order, prepaid_last_time, PAY_PERIOD, PREPAY, new_accrued_hrs):
+def manager_payroll(mgr, manager_rates, df_shift_merged, person_weeks, accrued_hrs, bonus_df, bonus, time_off, week_order, prepaid_last_time, PAY_PERIOD, PREPAY, new_accrued_hrs):
     '''
     Process payroll for managers and return manager payroll and acrrued hours.
 
     mgr -- list of managers
     manager_rates -- rates of managers
     df_shift_merged -- shift dataframe for the pay period
+    person_weeks -- each person's shifts split by work week (from split_by_name_and_work_week)
     accrued_hrs -- accrued hours (existing for manipulation)
     bonus_df -- bonus info as dataframe
     bonus -- bonus summarized by person
@@ -947,34 +1093,39 @@ def manager_payroll(mgr, manager_rates, df_shift_merged, accrued_hrs, bonus_df,
     '''
     # list of managers
     mgr_payroll = []
-    df_shift_merged = deepcopy(df_shift_merged)
     aggregations = {'Min. Worked': 'sum', 'Regular Hourly Wage': 'first', 'Name': 'first'}
     if len(prepaid_last_time) > 0:
         prepaid_ppl = prepaid_last_time['Name'].unique()
     else:
         prepaid_ppl = set()
+    # rows of each person, grouped once for the loop below
+    prepaid_rows = group_rows_by(prepaid_last_time, 'Name')
+    time_off_rows = group_rows_by(time_off, 'Name')
+    bonus_rows = group_rows_by(bonus, 'Name')
+    premium_rows = group_rows_by(bonus_df, 'Name')
+    accrued_rows = group_rows_by(accrued_hrs, 'Staff')
+    accrued_frames = []
+    # worked shifts (not '-Not-Worked') are picked out once for everyone
+    worked_minutes = worked_minutes_by_name(df_shift_merged[~df_shift_merged['Shift'].str.contains('-Not-Worked', regex=False)])
+    rates = rates_by_name(manager_rates)
     for name in mgr:
-        df_indiv = df_shift_merged.loc[df_shift_merged['Name'] == name]
-        df_indiv_worked = df_indiv[~df_indiv['Shift'].str.contains('-Not-Worked')]
-        total_hours_worked = round(df_indiv_worked['Min. Worked'].sum()/60, 2)
-        regular_rate = manager_rates.loc[manager_rates['Name'] == name]['Admin/Sick/Vacay Wage'].iloc[0]
-        df_payroll = pd.DataFrame()
-        MGR_weekly_salary = manager_rates.loc[manager_rates['Name'] == name]['Exempt Weekly Salary'].iloc[0]
-        df_weeks = split_by_work_week(df_indiv)
+        minutes_worked, holiday_work_time = worked_minutes(name)
+        total_hours_worked = round(minutes_worked/60, 2)
+        regular_rate = rates[name]['Admin/Sick/Vacay Wage']
+        # rows are collected in a list and concatenated once
+        payroll_pieces = []
+        MGR_weekly_salary = rates[name]['Exempt Weekly Salary']
+        df_weeks = person_weeks(name)
         # Check for casted exempt status for the manager in the pay period
-        try:
-            exempt_casted = manager_rates.loc[manager_rates['Name'] == name]['Treat as Exempt (E) or Non-Exempt (NE)'].iloc[0]
-        except:
-            exempt_casted = ""
+        exempt_casted = rates[name].get('Treat as Exempt (E) or Non-Exempt (NE)', "")
         for key in df_weeks.keys(): #each key is a timestamp
-            df_weekly = deepcopy(df_weeks[key])
-            df_payroll_weekly = pd.DataFrame()
+            df_weekly = df_weeks[key]
             # add prepaid time
             if (key == week_order[0]) and (name in prepaid_ppl): #first week and prepaid
                 df_prepaid = pd.DataFrame({'Name': name, 'Shift': ['Prepaid Last Time'], 'Min. Worked': [60.0], 
                                             'Regular Hourly Wage': [-MGR_weekly_salary]})
-                df_payroll_weekly = pd.concat([df_payroll_weekly, df_prepaid], ignore_index=True)
-                df_weekly = pd.concat([prepaid_last_time.loc[prepaid_last_time.Name == name], df_weekly],ignore_index=True)
+                payroll_pieces.append(df_prepaid)
+                df_weekly = pd.concat([prepaid_rows(name), df_weekly],ignore_index=True)
             weekly_hours_worked = round(df_weekly['Min. Worked'].sum()/60, 2)
             df_weekly_worked = df_weekly[~df_weekly['Shift'].str.contains('MGR-Direct-Care|-Not-Worked')]
             exempt_hours_worked = (df_weekly_worked.loc[df_weekly_worked['Shift'] != 'MGR-Direct-Care']['Min. Worked'].sum()/60).round(2)
@@ -988,58 +1139,54 @@ def manager_payroll(mgr, manager_rates, df_shift_merged, accrued_hrs, bonus_df,
                 exempt_status = (exempt_hours_worked >= (weekly_hours_worked - exempt_hours_worked) or ((key==week_order[-1]) and PREPAY)) #True means exempt
             # Exempt
             if exempt_status: 
-                MGR_weekly_salary = manager_rates.loc[manager_rates['Name'] == name]['Exempt Weekly Salary'].iloc[0]
+                MGR_weekly_salary = rates[name]['Exempt Weekly Salary']
                 tmp = pd.DataFrame({'Name': name, 'Shift': ['MGR Salary'], 'Min. Worked': [60.0], 'Regular Hourly Wage': [MGR_weekly_salary]})
-                df_payroll_weekly = pd.concat([df_payroll_weekly,tmp], ignore_index=True)
+                payroll_pieces.append(tmp)
             else: #Non exempt
                 aggregations2 = {'Min. Worked': 'sum',  'Name': 'first'}
-                tmp = deepcopy(df_weekly[['Name', 'Shift', 'Min. Worked']])
+                tmp = df_weekly[['Name', 'Shift', 'Min. Worked']].copy()
                 tmp['Shift'] = tmp['Shift'] + " (" + key + ")"
                 tmp = tmp.groupby('Shift').agg(aggregations2)
                 tmp = tmp.reset_index() 
                 tmp['Regular Hourly Wage'] = [regular_rate]*len(tmp)
-                df_payroll_weekly = pd.concat([df_payroll_weekly,tmp], ignore_index=True)
+                payroll_pieces.append(tmp)
                 overtime_hours = max(0, weekly_hours_worked-40)
                 if overtime_hours > 0:
                     BOT_pay_rate = (0.5 * regular_rate).round(2)
                     df_overtime = pd.DataFrame({'Name': name, 'Shift': [f'OT Extra Pay ({key})'], 
                                                 'Min. Worked': [overtime_hours], 'Regular Hourly Wage': [BOT_pay_rate]})
-                    df_payroll_weekly= pd.concat([df_payroll_weekly, df_overtime], ignore_index=True)
-            df_payroll=pd.concat([df_payroll, df_payroll_weekly], ignore_index=True)
+                    payroll_pieces.append(df_overtime)
+        # the extra one-row entries are collected as dicts and added as one dataframe
+        extra_rows = []
         #add holiday bonus
-        holiday_work_time = df_indiv_worked['Holiday Worked Duration (Minutes)'].sum()
         if holiday_work_time > 0:
-            df_holiday_pay = pd.DataFrame({'Name': name, 'Shift': ['Holiday Extra Pay'], 'Min. Worked': [holiday_work_time], 
-                                        'Regular Hourly Wage': [round(regular_rate/2, 2)]})
-            df_payroll= pd.concat([df_payroll, df_holiday_pay], ignore_index=True)
+            extra_rows.append({'Name': name, 'Shift': 'Holiday Extra Pay', 'Min. Worked': holiday_work_time, 
+                               'Regular Hourly Wage': round(regular_rate/2, 2)})
         #add sick and vacation
-        pay_period_sick_time = time_off.loc[time_off['Name']== name]['Sick Hrs'].sum()
-        pay_period_vac_time = time_off.loc[time_off['Name']== name]['Vac Hrs'].sum()      
-        if name in list(time_off['Name']):
+        pay_period_sick_time = time_off_rows(name)['Sick Hrs'].sum()
+        pay_period_vac_time = time_off_rows(name)['Vac Hrs'].sum()      
+        if len(time_off_rows(name)) > 0:
             if pay_period_sick_time > 0:
                 #this is hourly wage for sick cash out
                 sick_amount = regular_rate
-                df_sick = pd.DataFrame({'Name': name, 'Shift': ['Sick Leave Used'], 'Min. Worked': [60*pay_period_sick_time], 
-                                        'Regular Hourly Wage': [sick_amount]})
-                df_payroll= pd.concat([df_payroll, df_sick], ignore_index=True)
+                extra_rows.append({'Name': name, 'Shift': 'Sick Leave Used', 'Min. Worked': 60*pay_period_sick_time, 
+                                   'Regular Hourly Wage': sick_amount})
             if pay_period_vac_time > 0:
                 vac_amount = regular_rate
-                df_vac = pd.DataFrame({'Name': name, 'Shift': ['Vacation Payout'], 'Min. Worked': [60*pay_period_vac_time], 
-                                       'Regular Hourly Wage': [vac_amount]})
-                df_payroll= pd.concat([df_payroll, df_vac], ignore_index=True)
+                extra_rows.append({'Name': name, 'Shift': 'Vacation Payout', 'Min. Worked': 60*pay_period_vac_time, 
+                                   'Regular Hourly Wage': vac_amount})
         #bonus
-        if name in list(bonus['Name']):
-            bonus_amount = bonus.loc[bonus['Name'] == name]['Bonus Amount'].sum()
-            df_bonus = pd.DataFrame({'Name': name, 'Shift': ['Bonus'], 'Min. Worked': [60.0], 
-                                     'Regular Hourly Wage': [bonus_amount]})
-            #Add to payroll
-            df_payroll= pd.concat([df_payroll, df_bonus], ignore_index=True)
+        if len(bonus_rows(name)) > 0:
+            bonus_amount = bonus_rows(name)['Bonus Amount'].sum()
+            extra_rows.append({'Name': name, 'Shift': 'Bonus', 'Min. Worked': 60.0, 'Regular Hourly Wage': bonus_amount})
         #premium
-        premium_hrs = bonus_df.loc[bonus_df.Name == name]['Premium Pay Hours'].sum()
+        premium_hrs = premium_rows(name)['Premium Pay Hours'].sum()
         if premium_hrs > 0:
-            df_premium = pd.DataFrame({'Name': name, 'Shift': ['Premium Pay'], 'Min. Worked': [premium_hrs*60], 
-                                       'Regular Hourly Wage': [1.5*regular_rate]})
-            df_payroll= pd.concat([df_payroll, df_premium], ignore_index=True)
+            extra_rows.append({'Name': name, 'Shift': 'Premium Pay', 'Min. Worked': premium_hrs*60, 
+                               'Regular Hourly Wage': 1.5*regular_rate})
+        if extra_rows:
+            payroll_pieces.append(pd.DataFrame(extra_rows))
+        df_payroll = pd.concat(payroll_pieces, ignore_index=True) if payroll_pieces else pd.DataFrame()
         df_payroll = df_payroll.groupby('Shift').agg(aggregations)
         df_payroll = df_payroll.reset_index()
         df_payroll = df_payroll.rename(columns={'Regular Hourly Wage': 'Wage'})
@@ -1049,7 +1196,7 @@ def manager_payroll(mgr, manager_rates, df_shift_merged, accrued_hrs, bonus_df,
         df_payroll['Gross Wages'] = (df_payroll['Hrs. Worked'] * df_payroll['Wage']).round(2)
         total_gross_wage = df_payroll['Gross Wages'].sum()
         #Accrual
-        accrued_df = deepcopy(accrued_hrs.loc[accrued_hrs.Staff == name])
+        accrued_df = accrued_rows(name).copy()
         accrued_df['YTD Vacation Taken'] += pay_period_vac_time
         accrued_df['Sick Taken'] += pay_period_sick_time
         accrued_df['YTD Hours'] += total_hours_worked
@@ -1059,152 +1206,181 @@ def manager_payroll(mgr, manager_rates, df_shift_merged, accrued_hrs, bonus_df,
             accrued_df['YTD Vacation Accrued'] = 136
         accrued_df['Vacation Balance'] = accrued_df['YTD Vacation Accrued'] + accrued_df['Vac. Hrs Carried Over'] - accrued_df['YTD Vacation Taken']
         accrued_df['Sick Balance'] = accrued_df['Sick Bank'] - accrued_df['Sick Taken']
-        new_accrued_hrs = pd.concat([new_accrued_hrs, accrued_df], ignore_index=True)
+        accrued_frames.append(accrued_df)
+        # the person's updated accrual figures, read off once for the summary tables
+        accrued = accrued_df.iloc[0]
         is_sub = ' '
         mgr_payroll.append({'header': pd.DataFrame(columns=[name, is_sub]), 
                             'summary': pd.DataFrame({'Total Hours Worked': total_hours_worked, 
                                                     'Total Gross Wage': total_gross_wage, 
                                                     'Pay Period': PAY_PERIOD}, index=[0]).round(decimals=2), 
                             'payroll': df_payroll.round(decimals=2), 
-                            'accrued_A': pd.DataFrame({'Hrs. YTD': accrued_df['YTD Hours'].iloc[0], 
+                            'accrued_A': pd.DataFrame({'Hrs. YTD': accrued['YTD Hours'], 
                                                         'Hrs. Worked This Period': total_hours_worked,
-                                                        'Hire Date': manager_rates.loc[manager_rates.Name == name]['Hire Date'].iloc[0],
-                                                        'Calendar Days Since Hire Date': manager_rates.loc[manager_rates.Name == name]['Days Elapsed Since Hire Date'].iloc[0]},
+                                                        'Hire Date': rates[name]['Hire Date'],
+                                                        'Calendar Days Since Hire Date': rates[name]['Days Elapsed Since Hire Date']},
                                                         index=[0]).round(decimals=2),
-                            'accrued_B': pd.DataFrame({'Vac. Accrued YTD': accrued_df['YTD Vacation Accrued'].iloc[0], 
-                                                        'Vac. Taken YTD': accrued_df['YTD Vacation Taken'].iloc[0], 
+                            'accrued_B': pd.DataFrame({'Vac. Accrued YTD': accrued['YTD Vacation Accrued'], 
+                                                        'Vac. Taken YTD': accrued['YTD Vacation Taken'], 
                                                         'Vac. Accrued This Period': pay_period_accrued_vac,
                                                         'Vac. Taken This Period': pay_period_vac_time,
-                                                        'Vac. Hrs Carried Over': accrued_df['Vac. Hrs Carried Over'].iloc[0],
-                                                        'Vac. Balance': accrued_df['Vacation Balance'].iloc[0]},index=[0]).round(decimals=2),
-                            'accrued_C': pd.DataFrame({'Sick Bank YTD': accrued_df['Sick Bank'].iloc[0], 
-                                                        'Sick Taken YTD': accrued_df['Sick Taken'].iloc[0], 
+                                                        'Vac. Hrs Carried Over': accrued['Vac. Hrs Carried Over'],
+                                                        'Vac. Balance': accrued['Vacation Balance']},index=[0]).round(decimals=2),
+                            'accrued_C': pd.DataFrame({'Sick Bank YTD': accrued['Sick Bank'], 
+                                                        'Sick Taken YTD': accrued['Sick Taken'], 
                                                         'Sick Taken This Period':pay_period_sick_time,
-                                                        'Sick Balance': accrued_df['Sick Balance'].iloc[0]},index=[0]).round(decimals=2)
+                                                        'Sick Balance': accrued['Sick Balance']},index=[0]).round(decimals=2)
                             })      
+    # the updated accruals are appended to new_accrued_hrs in one concat
+    new_accrued_hrs = pd.concat([new_accrued_hrs] + accrued_frames, ignore_index=True)
     return (mgr_payroll, new_accrued_hrs)
 
-def non_manager_weekly_breakdown(non_mgr, df_shift_merged, prepaid_last_time, week_order):  
+def aggregate_by_shift(df, aggregations):
+    '''
+    Aggregate the rows of a small weekly table by shift, as df.groupby('Shift').agg(aggregations).reset_index() does.
+    When every shift appears once (and there is nothing to sum over missing values) the rows only need to be
+    sorted by shift, so the groupby is skipped.
+
+    df -- a pandas dataframe with a Shift column
+    aggregations -- dict of column -> 'sum' or 'first'
+
+    return a pandas dataframe with one row per shift, sorted by shift: Shift, then the aggregated columns.
+    '''
+    summed = [column for column, how in aggregations.items() if how == 'sum']
+    if len(df) == 0 or not df['Shift'].is_unique or df['Shift'].isna().any() or df[summed].isna().any(axis=None):
+        return df.groupby('Shift').agg(aggregations).reset_index()
+    return df.sort_values('Shift')[['Shift', *aggregations]].reset_index(drop=True)
+
+def breakdown_shift_kinds(shifts):
+    '''
+    Pick out the kinds of rows of a weekly breakdown that need their hours or wages corrected, one scan each.
+
+    shifts -- the Shift column of a weekly breakdown
+
+    return boolean series: not-worked shifts, OT extra pay, asleep shifts (not their holiday extra pay), and prepaid rows.
+    '''
+    not_worked = shifts.str.contains('-Not-Worked', regex=False)
+    ot_extra = shifts.str.contains('OT Extra', regex=False)
+    asleep = shifts.str.contains('Asleep', regex=False) & ~shifts.str.contains('Holiday Extra Pay', regex=False)
+    prepaid = shifts.str.contains('PREPAID', regex=False)
+    return (not_worked, ot_extra, asleep, prepaid)
+
+def breakdown_hours_and_wages(minutes, wage, shifts):
+    '''
+    Compute the hours and wages columns of a non-manager weekly breakdown on NumPy arrays,
+    with the corrections for each kind of row applied as masks.
+
+    minutes -- array of minutes of each row
+    wage -- array of the wage of each row
+    shifts -- the Shift column of the breakdown
+
+    return a dict of the columns Hrs. Worked, Hrs. Paid, Nova-Paid Hrs., Wage, Gross Wages and Nova-Paid Gross Wages,
+    and the boolean array of prepaid rows.
+    '''
+    not_worked, ot_extra, asleep, prepaid = (kind.to_numpy() for kind in breakdown_shift_kinds(shifts))
+    hours = np.round(minutes/60, 2)
+    gross_wages = hours * wage
+    columns = {'Hrs. Worked': np.where(not_worked | ot_extra, 0, hours),
+               'Hrs. Paid': np.where(ot_extra, 0, hours),
+               #In Nova-Paid Hrs. We exclude IHSS asleep
+               'Nova-Paid Hrs.': np.where(asleep, 0, hours),
+               'Wage': wage,
+               'Gross Wages': np.where(ot_extra, 0, gross_wages),
+               'Nova-Paid Gross Wages': np.where(asleep, 0, gross_wages)}
+    return (columns, prepaid)
+
+def non_manager_weekly_breakdown(non_mgr, person_weeks, prepaid_last_time, week_order):  
     '''
     Generate weekly breakdown for non-managers
     ''' 
     #Create a list that stores the payroll dictionary
     non_mgr_payroll = []
-    prepaid_last_time = deepcopy(prepaid_last_time)
-    df_shift_merged = deepcopy(df_shift_merged)
     if len(prepaid_last_time) > 0:
         prepaid_ppl = prepaid_last_time['Name'].unique()
     else:
         prepaid_ppl = set()
+    # each person's prepaid shifts, grouped once for the loop below
+    prepaid_rows = group_rows_by(prepaid_last_time, 'Name')
     #For each non-manager
     for _, name in enumerate(non_mgr):
         #subset to the individual's shift
         aggregations = {'Min. Worked': 'sum', 'BOT Hourly Wage': 'first', 'Name': 'first'}
-        df_indiv = df_shift_merged.loc[df_shift_merged['Name'] == name]
-        df_weeks = split_by_work_week(df_indiv)
+        df_weeks = person_weeks(name)
         for key in df_weeks.keys(): #each key is a timestamp
-            df_weekly = deepcopy(df_weeks[key])
-            df_payroll = deepcopy(df_weekly[['Shift', 'Min. Worked', 'BOT Hourly Wage', 'Name']])
+            df_weekly = df_weeks[key]
+            # rows are collected in a list and concatenated once
+            payroll_pieces = [df_weekly[['Shift', 'Min. Worked', 'BOT Hourly Wage', 'Name']]]
             if (key == week_order[0]) and (name in prepaid_ppl): #first week and prepaid
-                df_weekly = pd.concat([prepaid_last_time.loc[prepaid_last_time.Name == name], df_weekly], ignore_index=True)
-                prepaid_concat = prepaid_last_time.loc[prepaid_last_time.Name == name]
+                df_weekly = pd.concat([prepaid_rows(name), df_weekly], ignore_index=True)
+                prepaid_concat = prepaid_rows(name).copy()
                 prepaid_concat['Shift'] = 'PREPAID ' + prepaid_concat['Shift']
-                prepaid_concat=prepaid_concat[['Shift', 'Min. Worked', 'BOT Hourly Wage', 'Name']]
-                df_payroll= pd.concat([df_payroll, prepaid_concat], ignore_index=True)
-            df_weekly_worked = df_weekly[~df_weekly['Shift'].str.contains('-Not-Worked')]
-            weekly_hours_worked = round(df_weekly_worked['Min. Worked'].sum()/60, 2)
-            weekly_hours_paid = round(df_weekly['Min. Worked'].sum()/60, 2)
-            overtime_hours = max(0, weekly_hours_worked - 40)
-            ot_rate =((df_weekly['BOT Hourly Wage']*(df_weekly['Min. Worked']/60).round(2)).sum()/weekly_hours_paid)
+                payroll_pieces.append(prepaid_concat[['Shift', 'Min. Worked', 'BOT Hourly Wage', 'Name']])
+            weekly_worked = ~df_weekly['Shift'].str.contains('-Not-Worked', regex=False)
+            df_weekly_worked = df_weekly[weekly_worked]
+            weekly_hours_worked, weekly_hours_paid, overtime_hours, ot_rate = weekly_overtime(
+                df_weekly['Min. Worked'].to_numpy(dtype=float), df_weekly['BOT Hourly Wage'].to_numpy(dtype=float), weekly_worked.to_numpy())
             if overtime_hours > 0:
-                df_overtime = pd.DataFrame({'Name': name, 'Shift': [f'OT Extra Pay ({key})'], 'Min. Worked': [round(overtime_hours*60, 2)], 
-                                        'BOT Hourly Wage': [round(ot_rate/2, 2)]})
                 #Add to payroll
-                df_payroll= pd.concat([df_payroll, df_overtime], ignore_index=True)
-            df_payroll = df_payroll.groupby('Shift').agg(aggregations)
-            df_payroll = df_payroll.reset_index()
+                payroll_pieces.append(pd.DataFrame([{'Name': name, 'Shift': f'OT Extra Pay ({key})', 'Min. Worked': round(overtime_hours*60, 2),
+                                                     'BOT Hourly Wage': round(ot_rate/2, 2)}]))
+            df_payroll = pd.concat(payroll_pieces, ignore_index=True)
+            df_payroll = aggregate_by_shift(df_payroll, aggregations)
             #Dealing with holiday
-            #reassign variables to remove prepaid hours
-            df_weekly = deepcopy(df_weeks[key])
             if df_weekly_worked['Holiday Worked Duration (Minutes)'].sum() > 0:
                 df_holiday_pay = df_weekly_worked[['Name', 'Shift', 'Holiday Worked Duration (Minutes)', 'BOT Hourly Wage']]
-                df_holiday_pay = df_holiday_pay[df_holiday_pay['Holiday Worked Duration (Minutes)'] != 0]
-                df_holiday_pay['Shift'] = df_holiday_pay['Shift'].apply(lambda x: x + ' Holiday Extra Pay')
+                df_holiday_pay = df_holiday_pay[df_holiday_pay['Holiday Worked Duration (Minutes)'] != 0].copy()
+                df_holiday_pay['Shift'] = df_holiday_pay['Shift'] + ' Holiday Extra Pay'
                 df_holiday_pay['BOT Hourly Wage'] = df_holiday_pay['BOT Hourly Wage']*0.5
                 df_holiday_pay = df_holiday_pay.rename(columns={'Holiday Worked Duration (Minutes)': 'Min. Worked'})
-                df_holiday_pay = df_holiday_pay.groupby('Shift').agg(aggregations)
-                df_holiday_pay = df_holiday_pay.reset_index()
+                df_holiday_pay = aggregate_by_shift(df_holiday_pay, aggregations)
                 df_payroll= pd.concat([df_payroll, df_holiday_pay], ignore_index=True)
             df_payroll = df_payroll.rename(columns={'BOT Hourly Wage': 'Wage'})
-            df_payroll['Min. Worked'] = pd.to_numeric(df_payroll['Min. Worked'], errors='coerce')
-            df_payroll['Hrs. Worked'] = (df_payroll['Min. Worked']/60).round(2)
-            df_payroll['Hrs. Paid'] = df_payroll['Hrs. Worked']
-            df_payroll = df_payroll.reindex(columns=['Name', 'Shift', 'Min. Worked', 'Hrs. Worked', 'Hrs. Paid', 'Wage'])
-            df_payroll['Gross Wages'] = df_payroll['Hrs. Worked'] * df_payroll['Wage']
-            #In Nov-Paid Hrs. We exclude IHSS asleep
-            df_payroll['Nova-Paid Hrs.'] = df_payroll['Hrs. Worked']
-            #Correct Hours worked
-            df_payroll.loc[df_payroll['Shift'].str.contains('-Not-Worked'), 'Hrs. Worked'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('OT Extra'), 'Hrs. Paid'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('OT Extra'), 'Hrs. Worked'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('Asleep') & ~df_payroll['Shift'].str.contains('Holiday Extra Pay'), 'Nova-Paid Hrs.'] = 0
-            df_payroll['Nova-Paid Gross Wages'] = df_payroll['Gross Wages']
-            df_payroll.loc[df_payroll['Shift'].str.contains('Asleep') & ~df_payroll['Shift'].str.contains('Holiday Extra Pay'), 'Nova-Paid Gross Wages'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('OT Extra'), 'Gross Wages'] = 0
-            column_order = ['Name', 'Shift', 'Hrs. Worked', 'Hrs. Paid', 'Nova-Paid Hrs.', 'Wage', 'Gross Wages', 'Nova-Paid Gross Wages']
-            df_payroll = df_payroll[column_order]
-            real_wages_paid = df_payroll['Nova-Paid Gross Wages'].sum() - df_payroll.loc[df_payroll['Shift'].str.contains('PREPAID')]['Nova-Paid Gross Wages'].sum()
+            minutes = pd.to_numeric(df_payroll['Min. Worked'], errors='coerce').to_numpy(dtype=float)
+            #Correct Hours worked (each kind of shift is picked out once)
+            columns, prepaid = breakdown_hours_and_wages(minutes, df_payroll['Wage'].to_numpy(), df_payroll['Shift'])
+            df_payroll = pd.DataFrame({'Name': df_payroll['Name'], 'Shift': df_payroll['Shift'], **columns})
+            real_wages_paid = df_payroll['Nova-Paid Gross Wages'].sum() - df_payroll.loc[prepaid]['Nova-Paid Gross Wages'].sum()
             df_sum = pd.DataFrame(df_payroll.round(decimals=2).sum(axis=0)).T
             df_sum['Name']="TOTAL"
             df_sum['Shift']="---"
             overtime_rate = round((df_sum['Gross Wages']/df_sum['Hrs. Paid']).iloc[0], 2)
-            df_payroll = pd.concat([df_payroll, df_sum], ignore_index=True).append(pd.DataFrame(index=[1]))
-            non_mgr_payroll.append({'header': pd.DataFrame(columns=[name, 'Week of ' + key]), 
+            df_payroll = pd.concat([df_payroll, df_sum], ignore_index=True)
+            non_mgr_payroll.append({'header': (name, 'Week of ' + key), 
                                     'summary': pd.DataFrame({ 
                                         'Weekly Nova-Paid Gross Wages - Prepaid Wages': real_wages_paid, 
                                         'Total Gross Wages / Total Hrs. Paid':overtime_rate}, index=[0]).round(decimals=2), 
-                                        'payroll': df_payroll.round(decimals=2)
+                                        'payroll': df_payroll
                                         })
     return non_mgr_payroll
 
-def manager_weekly_breakdown(mgr, manager_rates, df_shift_merged, week_order, prepaid_last_time, PAY_PERIOD, PREPAY):
+def manager_weekly_breakdown(mgr, manager_rates, person_weeks, week_order, prepaid_last_time, PAY_PERIOD, PREPAY):
     '''
     Generate the weekly breakdown for managers
     '''
     mgr_payroll = []
-    df_shift_merged = deepcopy(df_shift_merged)
     if len(prepaid_last_time) > 0:
         prepaid_ppl = prepaid_last_time['Name'].unique()
     else:
         prepaid_ppl = set()
+    # each person's prepaid shifts, grouped once for the loop below
+    prepaid_rows = group_rows_by(prepaid_last_time, 'Name')
     #aggregations = {'Min. Worked': 'sum', 'Regular Hourly Wage': 'first', 'Name': 'first'}
+    rates = rates_by_name(manager_rates)
     for name in mgr:
-        df_indiv = df_shift_merged.loc[df_shift_merged['Name'] == name]
-        df_indiv_worked = df_indiv[~df_indiv['Shift'].str.contains('-Not-Worked')]
-        df_payroll = pd.DataFrame(columns=['Name', 'Shift','Min. Worked', 'Regular Hourly Wage'])
-        holiday_work_time = df_indiv_worked['Holiday Worked Duration (Minutes)'].sum()
-        non_exempt_rate = manager_rates.loc[manager_rates['Name'] == name]['Non-exempt Hourly Wage'].iloc[0]
-        #holiday extra pay
-        if holiday_work_time > 0:
-            df_holiday_pay = pd.DataFrame({'Name': name, 'Shift': ['Holiday Extra Pay'], 'Min. Worked': [holiday_work_time], 
-                                            'Regular Hourly Wage': [round(0.5 * non_exempt_rate, 2)]})
-            df_payroll = df_holiday_pay
+        non_exempt_rate = rates[name]['Non-exempt Hourly Wage']
         # split by week
-        MGR_weekly_salary = manager_rates.loc[manager_rates['Name'] == name]['Exempt Weekly Salary'].iloc[0]
-        df_weeks = split_by_work_week(df_indiv)
-        try:
-            exempt_casted = manager_rates.loc[manager_rates['Name'] == name]['Treat as Exempt (E) or Non-Exempt (NE)'].iloc[0]
-        except:
-            exempt_casted = ""
+        MGR_weekly_salary = rates[name]['Exempt Weekly Salary']
+        df_weeks = person_weeks(name)
+        exempt_casted = rates[name].get('Treat as Exempt (E) or Non-Exempt (NE)', "")
         for key in df_weeks.keys(): #each key is a timestamp
-            df_weekly = deepcopy(df_weeks[key])
-            df_payroll = pd.DataFrame()
+            df_weekly = df_weeks[key]
+            # the week's rows are collected as dicts and built into one dataframe
+            payroll_rows = []
             if (key==week_order[0]) and (name in prepaid_ppl): #prepaid
-                df_prepaid = pd.DataFrame({'Name': name, 'Shift': ['PREPAID MGR Salary'], 'Min. Worked': [60.0], 
-                                            'Regular Hourly Wage': [MGR_weekly_salary]})
-                df_payroll = pd.concat([df_payroll, df_prepaid], ignore_index=True)
-                df_weekly = pd.concat([prepaid_last_time.loc[prepaid_last_time.Name == name], df_weekly],ignore_index=True)
-            df_weekly_worked = df_weekly[~df_weekly['Shift'].str.contains('-Not-Worked')]
+                payroll_rows.append({'Name': name, 'Shift': 'PREPAID MGR Salary', 'Min. Worked': 60.0, 
+                                     'Regular Hourly Wage': MGR_weekly_salary})
+                df_weekly = pd.concat([prepaid_rows(name), df_weekly],ignore_index=True)
+            df_weekly_worked = df_weekly[~df_weekly['Shift'].str.contains('-Not-Worked', regex=False)]
             weekly_hours_worked = (df_weekly_worked['Min. Worked'].sum()/60).round(2)
             exempt_hours_worked = (df_weekly_worked.loc[df_weekly_worked['Shift'] != 'MGR-Direct-Care']['Min. Worked'].sum()/60).round(2)
             overtime_hours = max(0, weekly_hours_worked-40)
@@ -1217,23 +1393,22 @@ def manager_weekly_breakdown(mgr, manager_rates, df_shift_merged, week_order, pr
                 exempt_status = (exempt_hours_worked >= (weekly_hours_worked - exempt_hours_worked) or ((key==week_order[-1]) and PREPAY)) #True means exempt
             # Exempt
             if exempt_status: 
-                MGR_weekly_salary = manager_rates.loc[manager_rates['Name'] == name]['Exempt Weekly Salary'].iloc[0]
-                tmp = pd.DataFrame({'Name': name, 'Shift': ['MGR Salary'], 'Min. Worked': [60.0], 'Regular Hourly Wage': [MGR_weekly_salary]})
-                df_payroll = pd.concat([df_payroll, tmp], ignore_index=True)
+                MGR_weekly_salary = rates[name]['Exempt Weekly Salary']
+                payroll_rows.append({'Name': name, 'Shift': 'MGR Salary', 'Min. Worked': 60.0, 'Regular Hourly Wage': MGR_weekly_salary})
             else: # Non-exempt
                 aggregations2 = {'Min. Worked': 'sum',  'Name': 'first'}
-                tmp = deepcopy(df_weekly[['Name', 'Shift', 'Min. Worked']])
+                tmp = df_weekly[['Name', 'Shift', 'Min. Worked']].copy()
                 tmp['Shift'] = tmp['Shift'] + " (" + key + ")"
-                tmp = tmp.groupby('Shift').agg(aggregations2)
-                tmp = tmp.reset_index() 
+                tmp = aggregate_by_shift(tmp, aggregations2)
                 tmp['Regular Hourly Wage'] = [non_exempt_rate]*len(tmp)
-                df_payroll = pd.concat([df_payroll, tmp], ignore_index=True)
+                payroll_rows.extend(tmp.to_dict('records'))
                 overtime_hours = max(0, weekly_hours_worked-40)
                 if overtime_hours > 0:
                     BOT_pay_rate = 0.5 * non_exempt_rate
-                    df_overtime = pd.DataFrame({'Name': name, 'Shift': [f'OT Extra Pay ({key})'], 'Min. Worked': [overtime_hours], 
-                                                'Regular Hourly Wage': [BOT_pay_rate]})
-                    df_payroll= pd.concat([df_payroll, df_overtime], ignore_index=True)
+                    payroll_rows.append({'Name': name, 'Shift': f'OT Extra Pay ({key})', 'Min. Worked': overtime_hours, 
+                                         'Regular Hourly Wage': BOT_pay_rate})
+            # (a non-exempt week without shifts keeps the empty, typed columns of tmp)
+            df_payroll = pd.DataFrame(payroll_rows) if payroll_rows else tmp
             df_payroll = df_payroll.rename(columns={'Regular Hourly Wage': 'Wage'})
             df_payroll['Min. Worked'] = pd.to_numeric(df_payroll['Min. Worked'], errors='coerce')
             df_payroll['Hrs. Worked'] = (df_payroll['Min. Worked']/60).round(2)
@@ -1241,27 +1416,28 @@ def manager_weekly_breakdown(mgr, manager_rates, df_shift_merged, week_order, pr
             df_payroll = df_payroll.reindex(columns=['Name', 'Shift', 'Min. Worked', 'Hrs. Worked', 'Hrs. Paid', 'Wage'])
             df_payroll['Gross Wages'] = df_payroll['Hrs. Worked'] * df_payroll['Wage']
             df_payroll['Nova-Paid Hrs.'] = df_payroll['Hrs. Worked']
-            #Correct Hours worked
-            df_payroll.loc[df_payroll['Shift'].str.contains('-Not-Worked'), 'Hrs. Worked'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('OT Extra'), 'Hrs. Paid'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('OT Extra'), 'Hrs. Worked'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('Asleep') & ~df_payroll['Shift'].str.contains('Holiday Extra Pay'), 'Nova-Paid Hrs.'] = 0
+            #Correct Hours worked (each kind of shift is picked out once)
+            not_worked, ot_extra, asleep, prepaid = breakdown_shift_kinds(df_payroll['Shift'])
+            df_payroll.loc[not_worked, 'Hrs. Worked'] = 0
+            df_payroll.loc[ot_extra, 'Hrs. Paid'] = 0
+            df_payroll.loc[ot_extra, 'Hrs. Worked'] = 0
+            df_payroll.loc[asleep, 'Nova-Paid Hrs.'] = 0
             df_payroll['Nova-Paid Gross Wages'] = df_payroll['Gross Wages']
-            df_payroll.loc[df_payroll['Shift'].str.contains('Asleep') & ~df_payroll['Shift'].str.contains('Holiday Extra Pay'), 'Nova-Paid Gross Wages'] = 0
-            df_payroll.loc[df_payroll['Shift'].str.contains('OT Extra'), 'Gross Wages'] = 0
+            df_payroll.loc[asleep, 'Nova-Paid Gross Wages'] = 0
+            df_payroll.loc[ot_extra, 'Gross Wages'] = 0
             column_order = ['Name', 'Shift', 'Hrs. Worked', 'Hrs. Paid', 'Nova-Paid Hrs.', 'Wage', 'Gross Wages', 'Nova-Paid Gross Wages']
             df_payroll = df_payroll[column_order]
-            df_sum = pd.DataFrame(df_payroll.loc[~df_payroll['Shift'].str.contains('PREPAID')].round(decimals=2).sum(axis=0)).T
+            df_sum = pd.DataFrame(df_payroll.loc[~prepaid].round(decimals=2).sum(axis=0)).T
             df_sum['Name']="TOTAL"
             df_sum['Shift']="---"
             #when managers are prepaid they are prepaid for the whole week
-            real_wages_paid = df_payroll['Nova-Paid Gross Wages'].sum() - 2*df_payroll.loc[df_payroll['Shift'].str.contains('PREPAID')]['Nova-Paid Gross Wages'].sum()
-            df_payroll = pd.concat([df_payroll, df_sum], ignore_index=True).append(pd.DataFrame(index=[1]))
-            mgr_payroll.append({'header': pd.DataFrame(columns=[name, 'Week of ' + key]), 
+            real_wages_paid = df_payroll['Nova-Paid Gross Wages'].sum() - 2*df_payroll.loc[prepaid]['Nova-Paid Gross Wages'].sum()
+            df_payroll = pd.concat([df_payroll, df_sum], ignore_index=True)
+            mgr_payroll.append({'header': (name, 'Week of ' + key), 
                                     'summary': pd.DataFrame({ 
                                         'Weekly Nova-Paid Gross Wages - Prepaid Wages': real_wages_paid
                                                             }, index=[0]).round(decimals=2), 
-                                        'payroll': df_payroll.round(decimals=2)
+                                        'payroll': df_payroll
                                         })   
     return mgr_payroll
 
@@ -1278,11 +1454,11 @@ def generate_payroll(df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, ma
     Return results from the four methods
     '''
     staff_names = set().union(*[df_shift_merged.Name, bonus.Name, time_off.Name]).intersection(set().union(*[staff_info.Name, manager_rates.Name]))
-    manager_status = [is_manager(i,manager_rates) for i in staff_names]
+    manager_names = frozenset(manager_rates['Name'])
     non_mgr = [] #list of names
     mgr = [] #list of names
-    for i, name in enumerate(staff_names):
-        if manager_status[i]:
+    for name in staff_names:
+        if is_manager(name, manager_names):
             mgr.append(name)
         else:
             non_mgr.append(name)
@@ -1294,101 +1470,141 @@ def generate_payroll(df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, ma
     time_off = time_off.round(2)
     staff_info = staff_info.round(2)
     prepaid_last_time = prepaid_last_time.round(2)
+    # each person's shifts split by work week once, for the payroll and the weekly breakdowns
+    person_weeks = split_by_name_and_work_week(df_shift_merged)
     non_mgr_pr = {}
     mgr_pr = {}
     non_mgr_bkd = {}
     mgr_bkd = {}
-    if any(is_manager(name, manager_rates) == False for name in staff_names):
+    if non_mgr:
         non_mgr_pr, new_accrued_hrs = non_manager_payroll(non_mgr, df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, staff_info,
                                                         week_order, prepaid_last_time, PAY_PERIOD, new_accrued_hrs)
-        non_mgr_bkd = non_manager_weekly_breakdown(non_mgr, df_shift_merged, prepaid_last_time, week_order)
-    if any(is_manager(name, manager_rates) for name in staff_names):
-        mgr_pr, new_accrued_hrs = manager_payroll(mgr, manager_rates, df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, week_order, 
+        non_mgr_bkd = non_manager_weekly_breakdown(non_mgr, person_weeks, prepaid_last_time, week_order)
+    if mgr:
+        mgr_pr, new_accrued_hrs = manager_payroll(mgr, manager_rates, df_shift_merged, person_weeks, accrued_hrs, bonus_df, bonus, time_off, week_order, 
                                               prepaid_last_time, PAY_PERIOD, PREPAY, new_accrued_hrs)
-        mgr_bkd = manager_weekly_breakdown(mgr, manager_rates, df_shift_merged, week_order, prepaid_last_time, PAY_PERIOD, PREPAY)
+        mgr_bkd = manager_weekly_breakdown(mgr, manager_rates, person_weeks, week_order, prepaid_last_time, PAY_PERIOD, PREPAY)
 
     return (non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs)
 
-def output_payroll_files(save_path, df_shift_merged, staff_info, non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs, original_bonus_df, time_off_as_shifts, non_manager_rates, manager_rates, prepaid_hours, df_after_pay_period, PAY_PERIOD):
+def clear_manager_entries(manager_rates):
+    '''
+    Clear the entries of the MANAGER INFO tab that only apply to one pay period (in place).
+
+    manager_rates -- a pandas dataframe version of the MANAGER INFO TAB of the old tracker
+    '''
+    manager_rates['Reimbursable Mileage'] = ''
+    manager_rates['Expense Reimbursement'] = ''
+    # clear special manager exempt status, if it exists.
+    if 'Treat as Exempt (E) or Non-Exempt (NE)' in manager_rates.columns:
+        manager_rates['Treat as Exempt (E) or Non-Exempt (NE)'] = ""
+
+def shift_breakdown_table(df_shift_merged):
+    '''
+    Build the shift breakdown table written to the payroll and invoice files: the hours columns are added,
+    values are rounded to 2 decimals and the columns are put in output order. Build it once per run.
+
+    df_shift_merged -- shift dataframe for the pay period (not modified)
+
+    return a pandas dataframe of the shift breakdowns.
+    '''
+    shift_table = df_shift_merged.assign(**{
+        'Holiday Worked Duration (Hours)': (df_shift_merged['Holiday Worked Duration (Minutes)']/60).round(2),
+        'Hrs. Worked': df_shift_merged['Min. Worked']/60}).round(decimals=2)
+    shift_table['Day of the Week'] = shift_table['CIDT'].dt.day_name()
+    return shift_table[['Name', 'First Name', 'Last Name', 'Shift_original', 'Shift','Day of the Week', 'Check-In Date', 'Check-In Time', 
+                        'Check-Out Date', 'Check-Out Time', 'Min. Worked', 'Hrs. Worked',  'Regular Hourly Wage', 'BOT Hourly Wage', 'Accrual Rate',
+                        'CIDT', 'CODT','Holiday Worked Duration (Minutes)','Holiday Worked Duration (Hours)']]
+
+def cell_text_lengths(df):
+    '''
+    Measure the text each column of a dataframe takes in a sheet written by to_excel, header included.
+    Missing values are written as empty cells.
+
+    df -- the pandas dataframe written to the sheet
+
+    return a list with the length of the longest text of each column.
+    '''
+    texts = df.astype(object).astype(str).mask(df.isna(), '')
+    lengths = texts.apply(lambda column: column.str.len().max()).fillna(0)
+    return [max(int(length), len(str(column))) for length, column in zip(lengths, df.columns)]
+
+def set_column_widths(worksheet, df, column_formats=None):
+    '''
+    Size each column of a sheet written from a dataframe to its longest value (or its header),
+    as measured by cell_text_lengths().
+
+    worksheet -- the xlsxwriter worksheet df was written to (from column A, with its header)
+    df -- the pandas dataframe written to the sheet
+    column_formats -- optional xlsxwriter formats for the cells of some columns, by column index
+    '''
+    for col_idx, column_length in enumerate(cell_text_lengths(df)):
+        worksheet.set_column(col_idx, col_idx, column_length, (column_formats or {}).get(col_idx))
+
+def output_payroll_files(save_path, shift_table, staff_info, non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs, original_bonus_df, time_off_as_shifts, non_manager_rates, manager_rates, prepaid_hours, df_after_pay_period, PAY_PERIOD):
     '''
     Output payroll files and save to an excel.
     '''
-    #refine shift outputs
-    df_shift_merged['Holiday Worked Duration (Hours)'] = (df_shift_merged['Holiday Worked Duration (Minutes)']/60).round(2)
-    df_shift_merged['Hrs. Worked'] = df_shift_merged['Min. Worked']/60
-    df_shift_merged = df_shift_merged.round(decimals=2)
-    df_shift_merged['Day of the Week'] = df_shift_merged['CIDT'].dt.day_name()
-    df_shift_merged = df_shift_merged[['Name', 'First Name', 'Last Name', 'Shift_original', 'Shift','Day of the Week', 'Check-In Date', 'Check-In Time', 
-                                       'Check-Out Date', 'Check-Out Time', 'Min. Worked', 'Hrs. Worked',  'Regular Hourly Wage', 'BOT Hourly Wage', 'Accrual Rate',
-                                       'CIDT', 'CODT','Holiday Worked Duration (Minutes)','Holiday Worked Duration (Hours)']]
-    df_shift_merged = df_shift_merged.reindex(columns=['Name', 'First Name', 'Last Name', 'Shift_original', 'Shift','Day of the Week', 'Check-In Date', 
-                                                       'Check-In Time', 'Check-Out Date', 'Check-Out Time', 'Min. Worked', 'Hrs. Worked',  'Regular Hourly Wage', 
-                                                       'BOT Hourly Wage', 'Accrual Rate', 'CIDT', 'CODT','Holiday Worked Duration (Minutes)',
-                                                       'Holiday Worked Duration (Hours)'])
     #prepare payrolls
     payroll_list = [ *non_mgr_pr, *mgr_pr ]
     sorted_payroll_list = sorted(payroll_list, key=lambda x: x['header'].columns[0].split()[-1])
     bkd_list = [ *non_mgr_bkd, *mgr_bkd ]
-    sorted_bkd_list = sorted(bkd_list, key=lambda x: x['header'].columns[0].split()[-1])
+    sorted_bkd_list = sorted(bkd_list, key=lambda x: x['header'][0].split()[-1])
     #Output payroll
     payroll_path = save_path+"/"+f"PAYROLL OUTPUT - {PAY_PERIOD}.xlsx"
-    writer = pd.ExcelWriter(payroll_path) 
-    startrow = 0
-    total_gross_paid = 0
-    #print payroll for each person
-    for person in sorted_payroll_list:
-        total_gross_paid += person['summary']['Total Gross Wage'].values[0]
-        for df in [person['header'], person['payroll'],person['summary'], person['accrued_A'],person['accrued_B'],person['accrued_C']]:
-            df.to_excel(writer, engine="xlsxwriter",sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
-            startrow += (df.shape[0] + 1)
+    with pd.ExcelWriter(payroll_path, engine='xlsxwriter') as writer:
+        startrow = 0
+        total_gross_paid = 0
+        #print payroll for each person
+        for person in sorted_payroll_list:
+            total_gross_paid += person['summary']['Total Gross Wage'].values[0]
+            for df in [person['header'], person['payroll'],person['summary'], person['accrued_A'],person['accrued_B'],person['accrued_C']]:
+                df.to_excel(writer, sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
+                startrow += (df.shape[0] + 1)
+            startrow += 3
+        #print total gross wages paid
+        sum_total_gross_wage = pd.DataFrame({'Sum of Total Gross Wages': [total_gross_paid]})
+        sum_total_gross_wage.to_excel(writer, sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
         startrow += 3
-    #print total gross wages paid
-    sum_total_gross_wage = pd.DataFrame({'Sum of Total Gross Wages': [total_gross_paid]})
-    sum_total_gross_wage.to_excel(writer, engine="xlsxwriter",sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
-    startrow += 3
-    #reimbursements
-    mgr_reim = manager_rates[['Name', 'Reimbursable Mileage', 'Expense Reimbursement']]
-    stf_reim = staff_info[['Name', 'Reimbursable Mileage', 'Expense Reimbursement']]
-    reim = pd.concat([mgr_reim, stf_reim])
-    # Conditions to filter rows where both columns are either missing, both are empty strings, or both are zeros
-    condition = ~(
-        (pd.isna(reim['Reimbursable Mileage']) | (reim['Reimbursable Mileage'] == 0) | (reim['Reimbursable Mileage'] == "")) &
-        (pd.isna(reim['Expense Reimbursement']) | (reim['Expense Reimbursement'] == 0) | (reim['Expense Reimbursement'] == ""))
-    )
-    # Apply the condition to filter the DataFrame
-    reim = reim[condition]
-    if len(reim) > 0:
-        reim.to_excel(writer, engine="xlsxwriter",sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
-    writer.sheets['FINAL PAYROLL'].set_column('A:F', 24)
+        #reimbursements
+        mgr_reim = manager_rates[['Name', 'Reimbursable Mileage', 'Expense Reimbursement']]
+        stf_reim = staff_info[['Name', 'Reimbursable Mileage', 'Expense Reimbursement']]
+        reim = pd.concat([mgr_reim, stf_reim])
+        # Conditions to filter rows where both columns are either missing, both are empty strings, or both are zeros
+        condition = ~(
+            (pd.isna(reim['Reimbursable Mileage']) | (reim['Reimbursable Mileage'] == 0) | (reim['Reimbursable Mileage'] == "")) &
+            (pd.isna(reim['Expense Reimbursement']) | (reim['Expense Reimbursement'] == 0) | (reim['Expense Reimbursement'] == ""))
+        )
+        # Apply the condition to filter the DataFrame
+        reim = reim[condition]
+        if len(reim) > 0:
+            reim.to_excel(writer, sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
+        writer.sheets['FINAL PAYROLL'].set_column('A:F', 24)
     
-    startrow = 0
-    name = "NOVA"
-    for index, person in enumerate(sorted_bkd_list):
-        new_name = person['header'].columns[0]
-        if name.lower() != new_name.lower():
-            if startrow!=0:
-                startrow += 3
-            person['header'].columns=person['header'].columns.str.upper()
-        name = person['header'].columns[0]
-        for df in [person['header'], person['payroll'], person['summary']]:
-            df.to_excel(writer, engine="xlsxwriter",sheet_name='WEEKLY BREAKDOWNS', startrow=startrow, index=False)
-            startrow += (df.shape[0] + 1)
-        startrow += 2
-    writer.sheets['WEEKLY BREAKDOWNS'].set_column('A:H', 40)
-
-    df_shift_merged = pd.concat([df_shift_merged, time_off_as_shifts], ignore_index=True)
-    df_shift_merged = df_shift_merged.sort_values(by=['Last Name', 'CIDT'])
-    df_shift_merged.to_excel(writer, sheet_name="SHIFT BREAKDOWNS", index=False)
+        startrow = 0
+        name = "NOVA"
+        for index, person in enumerate(sorted_bkd_list):
+            # the header (name, week) is only made into a dataframe when it is written
+            header = person['header']
+            if name.lower() != header[0].lower():
+                if startrow!=0:
+                    startrow += 3
+                header = tuple(column.upper() for column in header)
+            name = header[0]
+            # a blank row is left under the payroll table
+            for df, gap in [(pd.DataFrame(columns=list(header)), 1), (person['payroll'], 2), (person['summary'], 1)]:
+                df.to_excel(writer, sheet_name='WEEKLY BREAKDOWNS', startrow=startrow, index=False)
+                startrow += (df.shape[0] + gap)
+            startrow += 2
+        writer.sheets['WEEKLY BREAKDOWNS'].set_column('A:H', 40)
 
-    for column in df_shift_merged:
-        column_length = max(df_shift_merged[column].astype(str).map(len).max(), len(column))
-        col_idx =df_shift_merged.columns.get_loc(column)
-        writer.sheets['SHIFT BREAKDOWNS'].set_column(col_idx, col_idx, column_length)
+        shift_table = pd.concat([shift_table, time_off_as_shifts], ignore_index=True)
+        shift_table = shift_table.sort_values(by=['Last Name', 'CIDT'])
+        shift_table.to_excel(writer, sheet_name="SHIFT BREAKDOWNS", index=False)
 
-    writer.save() 
+        set_column_widths(writer.sheets['SHIFT BREAKDOWNS'], shift_table)
     #output tracker
     new_tracker_path = save_path+"/"+f"NEW TRACKER - {PAY_PERIOD}.xlsx"
-    writer = pd.ExcelWriter(new_tracker_path) 
     new_accrued_hrs = new_accrued_hrs.sort_values(by='Staff', key=lambda x: x.str.split().str[-1])
     staff_info = staff_info.sort_values(by='Name', key=lambda x: x.str.split().str[-1])
     columns_to_keep = ['Full Name', 'First Name', 'Last Name']
@@ -1396,117 +1612,83 @@ def output_payroll_files(save_path, df_shift_merged, staff_info, non_mgr_pr, mgr
         if column not in columns_to_keep:
             original_bonus_df[column] = [np.nan]*len(original_bonus_df)
     # clear Reimbursable Mileage and Expense Reimbursement
-    manager_rates['Reimbursable Mileage'] = ''
-    manager_rates['Expense Reimbursement'] = ''
+    clear_manager_entries(manager_rates)
     staff_info['Reimbursable Mileage'] = ''
     staff_info['Expense Reimbursement'] = ''
-        # clear special manager exempt status, if it exists.
-    if 'Treat as Exempt (E) or Non-Exempt (NE)' in manager_rates.columns:
-        manager_rates['Treat as Exempt (E) or Non-Exempt (NE)'] = ""    
-    # write to excel
-    original_bonus_df.to_excel(writer, sheet_name='NEW PTO & BONUS INFO', index=False)
-    non_manager_rates.to_excel(writer, sheet_name='SHIFT INFO', index=False)
-    staff_info.to_excel(writer, sheet_name='STAFF INFO', index=False)
-    manager_rates.to_excel(writer, sheet_name='MANAGER INFO', index=False)
-    new_accrued_hrs.to_excel(writer, sheet_name="HRS & ACCRUALS", index=False)
-    prepaid_hours.to_excel(writer, sheet_name='IGNORE! (Prepaid Shifts)', index=False)
-    df_after_pay_period.to_excel(writer, sheet_name='IGNORE! (Next Period Shifts)', index=False)
-    # format columns
-    for column in original_bonus_df:
-        column_length = max(original_bonus_df[column].astype(str).map(len).max(), len(column))
-        col_idx = original_bonus_df.columns.get_loc(column)
-        writer.sheets['NEW PTO & BONUS INFO'].set_column(col_idx, col_idx, column_length)
-
-    for column in non_manager_rates:
-        column_length = max(non_manager_rates[column].astype(str).map(len).max(), len(column))
-        col_idx = non_manager_rates.columns.get_loc(column)
-        writer.sheets['SHIFT INFO'].set_column(col_idx, col_idx, column_length)
-
-    for column in new_accrued_hrs:
-        column_length = max(new_accrued_hrs[column].astype(str).map(len).max(), len(column))
-        col_idx =new_accrued_hrs.columns.get_loc(column)
-        writer.sheets['HRS & ACCRUALS'].set_column(col_idx, col_idx, column_length)
-
-    for column in manager_rates:
-        column_length = max(manager_rates[column].astype(str).map(len).max(), len(column))
-        col_idx = manager_rates.columns.get_loc(column)
-        writer.sheets['MANAGER INFO'].set_column(col_idx, col_idx, column_length)
-
-    for column in staff_info:
-        column_length = max(staff_info[column].astype(str).map(len).max(), len(column))
-        col_idx = staff_info.columns.get_loc(column)
-        writer.sheets['STAFF INFO'].set_column(col_idx, col_idx, column_length)
-
-    writer.save() 
-
-    # Load the Excel file
-    workbook = load_workbook(new_tracker_path)
-
-    # Select the active sheet
-    worksheet = workbook['HRS & ACCRUALS']
-
-    # Apply the background color to columns A to G
-    fill = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
-    for column in 'ABCDEFG':
-        for cell in worksheet[column]:
-            cell.fill = fill
-
-    # Save the modified Excel file
-    workbook.save(new_tracker_path)
-
-def output_payroll_for_one(selected_name, save_path, df_shift_merged, non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, time_off_as_shifts, PAY_PERIOD):
+    with pd.ExcelWriter(new_tracker_path, engine='xlsxwriter') as writer:
+        # write to excel
+        original_bonus_df.to_excel(writer, sheet_name='NEW PTO & BONUS INFO', index=False)
+        non_manager_rates.to_excel(writer, sheet_name='SHIFT INFO', index=False)
+        staff_info.to_excel(writer, sheet_name='STAFF INFO', index=False)
+        manager_rates.to_excel(writer, sheet_name='MANAGER INFO', index=False)
+        new_accrued_hrs.to_excel(writer, sheet_name="HRS & ACCRUALS", index=False)
+        prepaid_hours.to_excel(writer, sheet_name='IGNORE! (Prepaid Shifts)', index=False)
+        df_after_pay_period.to_excel(writer, sheet_name='IGNORE! (Next Period Shifts)', index=False)
+        # format columns
+        set_column_widths(writer.sheets['NEW PTO & BONUS INFO'], original_bonus_df)
+        set_column_widths(writer.sheets['SHIFT INFO'], non_manager_rates)
+        set_column_widths(writer.sheets['MANAGER INFO'], manager_rates)
+        set_column_widths(writer.sheets['STAFF INFO'], staff_info)
+        # background color for columns A to G of HRS & ACCRUALS
+        yellow = writer.book.add_format({'bg_color': '#FFFF99'})
+        yellow_header = writer.book.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top', 'bg_color': '#FFFF99'})
+        worksheet = writer.sheets['HRS & ACCRUALS']
+        set_column_widths(worksheet, new_accrued_hrs, {col_idx: yellow for col_idx in range(7)})
+        for col_idx, column in enumerate(new_accrued_hrs.columns[:7]):
+            worksheet.write(0, col_idx, column, yellow_header)
+
+def output_payroll_for_one(selected_name, save_path, shift_table, non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, time_off_as_shifts, PAY_PERIOD):
     '''
     Output payroll for just one person.
     '''
-    df_shift_merged['Holiday Worked Duration (Hours)'] = (df_shift_merged['Holiday Worked Duration (Minutes)']/60).round(2)
-    df_shift_merged['Hrs. Worked'] = df_shift_merged['Min. Worked']/60
-    df_shift_merged = df_shift_merged.round(decimals=2)
-    df_shift_merged['Day of the Week'] = df_shift_merged['CIDT'].dt.day_name()
-    df_shift_merged = df_shift_merged[['Name', 'First Name', 'Last Name', 'Shift_original', 'Shift','Day of the Week', 'Check-In Date', 'Check-In Time', 
-                                    'Check-Out Date', 'Check-Out Time', 'Min. Worked', 'Hrs. Worked',  'Regular Hourly Wage', 'BOT Hourly Wage', 'Accrual Rate',
-                                    'CIDT', 'CODT','Holiday Worked Duration (Minutes)','Holiday Worked Duration (Hours)']]
-    df_shift_merged = df_shift_merged.reindex(columns=['Name', 'First Name', 'Last Name', 'Shift_original', 'Shift','Day of the Week', 'Check-In Date', 
-                                                    'Check-In Time', 'Check-Out Date', 'Check-Out Time', 'Min. Worked', 'Hrs. Worked',  'Regular Hourly Wage', 
-                                                    'BOT Hourly Wage', 'Accrual Rate', 'CIDT', 'CODT','Holiday Worked Duration (Minutes)',
-                                                    'Holiday Worked Duration (Hours)']) 
     payroll_list = [ *non_mgr_pr, *mgr_pr ]
     bkd_list = [ *non_mgr_bkd, *mgr_bkd ]
-    sorted_bkd_list = sorted(bkd_list, key=lambda x: x['header'].columns[0].split()[-1])
+    sorted_bkd_list = sorted(bkd_list, key=lambda x: x['header'][0].split()[-1])
     #Output payroll
     payroll_path = save_path+"/"+f"OFF CYCLE PAYROLL OUTPUT - {selected_name} - {PAY_PERIOD}.xlsx"
-    writer = pd.ExcelWriter(payroll_path) 
-    startrow = 0
-    person  = [i for i in payroll_list if list(i['header'])[0] == selected_name][0]
-    for df in [person['header'], person['payroll'],person['summary'], person['accrued_A'],person['accrued_B'],person['accrued_C']]:
-        df.to_excel(writer, engine="xlsxwriter",sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
-        startrow += (df.shape[0] + 1)
-    writer.sheets['FINAL PAYROLL'].set_column('A:F', 24)
-    startrow = 0
-    name = "NOVA"
-    for index, person in enumerate(sorted_bkd_list):
-        new_name = person['header'].columns[0]
-        if name.lower() != new_name.lower():
-            if startrow!=0:
-                startrow += 3
-            person['header'].columns=person['header'].columns.str.upper()
-        name = person['header'].columns[0]
-        last_name = sorted_bkd_list[-1]
-        for df in [person['header'], person['payroll'], person['summary']]:
-            df.to_excel(writer, engine="xlsxwriter",sheet_name='WEEKLY BREAKDOWNS', startrow=startrow, index=False)
+    with pd.ExcelWriter(payroll_path, engine='xlsxwriter') as writer:
+        startrow = 0
+        person  = [i for i in payroll_list if list(i['header'])[0] == selected_name][0]
+        for df in [person['header'], person['payroll'],person['summary'], person['accrued_A'],person['accrued_B'],person['accrued_C']]:
+            df.to_excel(writer, sheet_name='FINAL PAYROLL', startrow=startrow, index=False)
             startrow += (df.shape[0] + 1)
-        startrow += 2
-    try:
-        writer.sheets['WEEKLY BREAKDOWNS'].set_column('A:H', 40)
-    except:
-        pass
-    df_shift_merged = pd.concat([df_shift_merged, time_off_as_shifts], ignore_index=True)
-    df_shift_merged = df_shift_merged.sort_values(by=['Last Name', 'CIDT'])
-    df_shift_merged.to_excel(writer, sheet_name="SHIFT BREAKDOWNS", index=False)
-    for column in df_shift_merged:
-        column_length = max(df_shift_merged[column].astype(str).map(len).max(), len(column))
-        col_idx =df_shift_merged.columns.get_loc(column)
-        writer.sheets['SHIFT BREAKDOWNS'].set_column(col_idx, col_idx, column_length)
-    writer.save()
+        writer.sheets['FINAL PAYROLL'].set_column('A:F', 24)
+        startrow = 0
+        name = "NOVA"
+        for index, person in enumerate(sorted_bkd_list):
+            # the header (name, week) is only made into a dataframe when it is written
+            header = person['header']
+            if name.lower() != header[0].lower():
+                if startrow!=0:
+                    startrow += 3
+                header = tuple(column.upper() for column in header)
+            name = header[0]
+            last_name = sorted_bkd_list[-1]
+            # a blank row is left under the payroll table
+            for df, gap in [(pd.DataFrame(columns=list(header)), 1), (person['payroll'], 2), (person['summary'], 1)]:
+                df.to_excel(writer, sheet_name='WEEKLY BREAKDOWNS', startrow=startrow, index=False)
+                startrow += (df.shape[0] + gap)
+            startrow += 2
+        try:
+            writer.sheets['WEEKLY BREAKDOWNS'].set_column('A:H', 40)
+        except:
+            pass
+        shift_table = pd.concat([shift_table, time_off_as_shifts], ignore_index=True)
+        shift_table = shift_table.sort_values(by=['Last Name', 'CIDT'])
+        shift_table.to_excel(writer, sheet_name="SHIFT BREAKDOWNS", index=False)
+        set_column_widths(writer.sheets['SHIFT BREAKDOWNS'], shift_table)
+
+def billed_amounts(hours, rates):
+    '''
+    Bill each row's hours at its rate, rounding every amount to the cent with Python's round.
+
+    hours -- a pandas series of hours
+    rates -- a pandas series of billing rates, with the same index
+
+    return a pandas series of billed amounts, with the same index.
+    '''
+    return pd.Series([round(hrs * rate, 2) for hrs, rate in zip(hours.tolist(), rates.tolist())],
+                     index=hours.index, dtype=float)
 
 def generate_invoice(df_shift_merged, manager_rates, non_manager_rates, staff_info, non_mgr_pr, mgr_pr):
     '''
@@ -1515,102 +1697,87 @@ def generate_invoice(df_shift_merged, manager_rates, non_manager_rates, staff_in
     # bill_rates: map name of shift to the billing rate
     # other_shifts: list of non-billable shifts
     # shift_list: list of all shifts, both billable and non-billable
-    bill_rates = {}
-    other_shifts = []
-    shift_list = []
     payroll_list = [ *non_mgr_pr, *mgr_pr ]
     df_shift_merged['Hrs. Worked'] = round(df_shift_merged['Min. Worked']/60, 2)
-    for _, row in non_manager_rates.iterrows():
-        # shift: name of the shift
-        shift = row[0]
-        shift_list.append(shift)
-        # obtain billable shifts
-        if not pd.isna(row[4]) and (isinstance(row[4], float) or isinstance(row[4], int)):
-            bill_rates[shift] = row[4]
-        # unbillable shifts
-        else:
-            other_shifts.append(shift)
+    shifts = non_manager_rates.iloc[:, 0]
+    rates = non_manager_rates.iloc[:, 4]
+    # billable shifts have a number as their billing rate (only a text column needs checking cell by cell)
+    if is_numeric_dtype(rates):
+        billable = rates.notna()
+    else:
+        billable = rates.map(lambda rate: isinstance(rate, (float, int)) and not pd.isna(rate)).astype(bool)
+    shift_list = shifts.tolist()
+    bill_rates = dict(zip(shifts[billable], rates[billable]))
+    other_shifts = shifts[~billable].tolist()
     #print(bill_rates)
     #print(other_shifts)
     #print(shift_list)
     # map each person to their HSS level
     staff_hss = {}
-    for _, row in staff_info.iterrows():
-        name = row[0]
-        hss_lvl = row["HSS Level"]
+    for name, hss_lvl in zip(staff_info.iloc[:, 0], staff_info["HSS Level"]):
         # handles rare case where hss_lvl is nan, where we set to HSS1
         if not isinstance(hss_lvl, str):
             hss_lvl = "HSS1"
         staff_hss[name] = hss_lvl
-    # map each person to ordered pair (shift, hours).
-    # this stores the data on what shift each person did and 
-    #   number of hours worked in that shift.
-    # append integer to distinguish shifts by same person.
-    #   e.g. Joe Shmoe0 is the first shift Joe Shmoe did;
-    #   Joe Shmoe1 is the second shift he did, etc.
-    payroll_dict = {}
+    # walk the (name, shift, hours) of every payroll row, in payroll order,
+    # and record the invoice shift, the billed shift and the hours of each billable row
+    # output is indexed by invoice shift, with columns [hours, rate, billable, bst_ins, bst_sarc]:
+    #   original gross hours, billing rate, billed amount, BST hours to insurance and BST hours to SARC;
+    #   last two columns added in next code block, and billable is updated for BST (only count those to SARC)
+    records = []
     for employee in payroll_list:
         payroll = employee["payroll"]
         # employee did not work
         if payroll.empty:
             continue
-        # row[0] = name, row[1] = shift, row[2] = hours
-        for _, row in payroll.iterrows():
-            payroll_dict[row[0] + str(_)] = (row[1], row[3])
-    # for each value of the dictionary, multiply hours by rate
-    # add result to the dictionary "output"
-    # output maps shift code to [original gross hours, rate, billable, BST hours to insurance, BST hours to SARC]
-    #   last two entries added in next code block, and billable is to be updated for BST (only count those to SARC)
-    output = {}
-
-    for _ in payroll_dict:
-        curr_name = _[:-1]
-        (curr_shift, curr_hours) = payroll_dict[_]
-        split_shift = curr_shift.split("-")
-        # name of shift to be displayed on invoice
-        output_shift = curr_shift
-        if curr_shift not in bill_rates and curr_shift != "CCR-Worked":
-            continue
-        if curr_shift == "CCR-Worked":
-            curr_shift = staff_hss[curr_name]
+        # column 0 = name, column 1 = shift, column 3 = hours
+        for curr_name, curr_shift, curr_hours in payroll.iloc[:, [0, 1, 3]].itertuples(index=False, name=None):
+            split_shift = curr_shift.split("-")
+            # name of shift to be displayed on invoice
             output_shift = curr_shift
-        elif curr_shift != "CCR-Not-Worked":
-            if len(split_shift) >= 2:
-                if split_shift[-1] == "Worked":
-                    if split_shift[-2] == "Not":
-                        # cut off "-Not-Worked"
-                        output_shift = curr_shift[:-11]
-                    else:
-                        # cut off "-Worked"
-                        output_shift = curr_shift[:-7]
-        # CCR-Not-Worked --> CCR
-        else:
-            output_shift = "CCR"
-        # map to (hours, bill_rate, amount)
-        # initialize if entry not already present
-        if output_shift not in output:
-            output[output_shift] = [0, bill_rates[curr_shift], 0]
-        output[output_shift][0] += curr_hours
+            if curr_shift not in bill_rates and curr_shift != "CCR-Worked":
+                continue
+            if curr_shift == "CCR-Worked":
+                curr_shift = staff_hss[curr_name]
+                output_shift = curr_shift
+            elif curr_shift != "CCR-Not-Worked":
+                if len(split_shift) >= 2:
+                    if split_shift[-1] == "Worked":
+                        if split_shift[-2] == "Not":
+                            # cut off "-Not-Worked"
+                            output_shift = curr_shift[:-11]
+                        else:
+                            # cut off "-Worked"
+                            output_shift = curr_shift[:-7]
+            # CCR-Not-Worked --> CCR
+            else:
+                output_shift = "CCR"
+            records.append((output_shift, curr_shift, curr_hours))
+    # total the hours of each invoice shift; its rate is that of the first shift billed under it
+    totals = pd.DataFrame(records, columns=["out", "src", "hrs"]).groupby("out", sort=False).agg(
+        hrs=("hrs", "sum"), src=("src", "first"))
     # round total hours (correct floating point error)
     # compute billable by multiplying hours with billing rate
-    for _ in output:
-        output[_][0] = round(output[_][0], 2)
-        output[_][2] = round(output[_][0] * output[_][1], 2)
+    # (Python's round on each value: Series.round would move some half cents to the even cent)
+    # (a shift without a billing rate, e.g. an unpriced HSS level, raises a KeyError)
+    shift_rates = [bill_rates[src] for src in totals["src"]]
+    output = pd.DataFrame({"hours": [round(hrs, 2) for hrs in totals["hrs"].tolist()], "rate": shift_rates},
+                          index=totals.index)
+    output["billable"] = billed_amounts(output["hours"], output["rate"])
 
     # manually obtain information on BCBA through df_shift_merged
     # BCBA to SARC: "BCBA"
     # BCBA to BlueShield
     BCBA_BlueShield = ["Adaptive-Behavior-Treatment", "Family-Adaptive-Behavior-Treatment", "Report-Writing"]
-    BCBA_hrs = 0
-    BCBA_BlueShield_hrs = 0
-    for index, row in df_shift_merged.iterrows():
-        if row["Shift_original"] == "BCBA":
-            BCBA_hrs += row["Hrs. Worked"]
-        elif row["Shift_original"] in BCBA_BlueShield:
-            BCBA_hrs += row["Hrs. Worked"]
-            BCBA_BlueShield_hrs += row["Hrs. Worked"]
-
-    output["BCBA"] = [round(BCBA_hrs, 2), bill_rates["BCBA"], round(BCBA_hrs * bill_rates["BCBA"], 2)]
+    # (hours are added up in shift order, as floats, so the rounded totals do not move)
+    shift_original = df_shift_merged["Shift_original"].to_numpy()
+    to_BlueShield = df_shift_merged["Shift_original"].isin(BCBA_BlueShield).to_numpy()
+    hrs_worked = df_shift_merged["Hrs. Worked"]
+    BCBA_hrs = sum(hrs_worked[(shift_original == "BCBA") | to_BlueShield].tolist())
+    BCBA_BlueShield_hrs = sum(hrs_worked[to_BlueShield].tolist())
+
+    output.loc["BCBA", ["hours", "rate", "billable"]] = [round(BCBA_hrs, 2), bill_rates["BCBA"],
+                                                         round(BCBA_hrs * bill_rates["BCBA"], 2)]
     ####################################################################################################
     # col 5 (E): Original Gross Hours (already there)
     # hours = [_[0] for _ in output.values()]
@@ -1627,67 +1794,39 @@ def generate_invoice(df_shift_merged, manager_rates, non_manager_rates, staff_in
     # [hours, rates, billable, BST_insurance_hrs, BST_SARC_hrs]
     ####################################################################################################
     # col 6
-    # RBT_dict: maps each BST to number of RBT hours
-    RBT_dict = {}
-    df_RBT = df_shift_merged[df_shift_merged["Shift_original"] == "RBT"]
-    for index, row in df_RBT.iterrows():
-        curr_shift = row["Shift"]
-        if curr_shift not in RBT_dict:
-            RBT_dict[curr_shift] = 0
-        RBT_dict[curr_shift] += row["Hrs. Worked"]
-    # add hours billed to insurance and BST hours to SARC
-    for shift in output:
-        if shift in RBT_dict:
-            RBT_hours = RBT_dict[shift]
-            shift_info = output[shift]
-            # add col 6 info
-            shift_info.append(round(RBT_hours, 2))
-            BST_SARC = shift_info[0] - shift_info[3]
-            if abs(BST_SARC) <= 0.01:
-                BST_SARC = 0
-                shift_info[3] = shift_info[0]
-            # add col 7 info
-            shift_info.append(round(BST_SARC, 2))
-            # update col 9 info
-            shift_info[2] = round(shift_info[4] * shift_info[1], 2)
-            output[shift] = shift_info
-        elif shift == "BCBA":
-            shift_info = output[shift]
-            shift_info.append(round(BCBA_BlueShield_hrs, 2))
-            BCBA_SARC = shift_info[0] - shift_info[3]
-            if abs(BCBA_SARC) <= 0.01:
-                BCBA_SARC = 0
-                shift_info[3] = shift_info[0]
-            shift_info.append(round(BCBA_SARC, 2))
-            shift_info[2] = round(shift_info[4] * shift_info[1], 2)
-            output[shift] = shift_info
-        else:
-            output[shift].append(0)
-            output[shift].append(output[shift][0])
+    # RBT_hours: maps each BST to number of RBT hours
+    # (hours are in cents, so the summation order cannot move the rounded totals)
+    df_RBT = df_shift_merged[shift_original == "RBT"]
+    RBT_hours = df_RBT.groupby("Shift", sort=False)["Hrs. Worked"].sum()
+    # add col 6 info: hours billed to insurance (BCBA hours to BlueShield, for the BCBA row)
+    insured = RBT_hours.reindex(output.index).round(2)
+    if pd.isna(insured["BCBA"]):
+        insured["BCBA"] = round(BCBA_BlueShield_hrs, 2)
+    has_insured = insured.notna()
+    # add col 7 info: the rest goes to SARC; a leftover of a cent or less is billed to insurance too
+    to_SARC = (output["hours"] - insured).round(2)
+    all_insured = has_insured & ((output["hours"] - insured).abs() <= 0.01)
+    insured = insured.mask(all_insured, output["hours"]).fillna(0)
+    output["bst_ins"] = insured
+    output["bst_sarc"] = to_SARC.mask(all_insured, 0).where(has_insured, output["hours"])
+    # update col 9 info
+    output["billable"] = billed_amounts(output["bst_sarc"], output["rate"]).where(has_insured, output["billable"])
     # list(range(8, len(manager_rates.columns))): list of indices
     #   of benefits columns
     benefits_cols = list(range(8, len(manager_rates.columns)))
-    mgr_benefits = manager_rates.iloc[:, [0] + benefits_cols]
-    mgr_benefits = mgr_benefits.transpose()
-    mgr_benefits.columns = mgr_benefits.iloc[0]
-    mgr_benefits = mgr_benefits.iloc[1:]
-    mgr_benefits = mgr_benefits.reset_index()
+    # one column per manager, one row per benefit (object dtype, as the transposed names made it);
+    # missing benefits are filled once, after the wages row is added
+    mgr_benefits = manager_rates.iloc[:, [0] + benefits_cols].astype(object)
+    mgr_benefits = mgr_benefits.set_index(manager_rates.columns[0]).transpose().reset_index()
     mgr_benefits = mgr_benefits.rename(columns={"index": "Benefit Name"})
-    mgr_benefits = mgr_benefits.fillna(0)
     # add row to benefits indicating gross wage
     # 1) map each manager to total gross wage for the pay period
-    mgr_gross = {}
     # managers are the last entries of payroll_list
-    for _ in range(len(manager_rates.index)):
-        name = payroll_list[-_-1]["payroll"].iloc[0][0]
-        wage = payroll_list[-_-1]["summary"].iloc[0][1]
-        mgr_gross[name] = wage
+    mgrs = payroll_list[len(payroll_list) - len(manager_rates.index):]
+    mgr_gross = {m["payroll"].iat[0, 0]: m["summary"].iat[0, 1]
+                 for m in reversed(mgrs)}
     # 2) construct row; make sure order is right
-    wages = ["Wages"]
-    for _, col in enumerate(mgr_benefits):
-        if _ < 1:
-            continue
-        wages.append(mgr_gross[col])
+    wages = ["Wages"] + [mgr_gross[col] for col in list(mgr_benefits.columns)[1:]]
     # 3) add row
     mgr_benefits.loc[len(mgr_benefits.index)] = wages
     # replace NaN
@@ -1697,28 +1836,58 @@ def generate_invoice(df_shift_merged, manager_rates, non_manager_rates, staff_in
     print (mgr_benefits)
     mgr_benefits.drop(index=0, inplace=True)
     print (mgr_benefits)
-    # sum the columns
-    totals = mgr_benefits.sum()
-    totals = totals.to_frame().transpose()
-    totals.iloc[0][0] = "Total"
-    mgr_benefits = pd.concat([mgr_benefits, totals])
+    # sum the columns into a bottom row (label 0 is free again after the drop)
+    totals = mgr_benefits.iloc[:, 1:].sum()
+    mgr_benefits.loc[0] = ["Total"] + totals.tolist()
     df_benefits = mgr_benefits
     # obtain grand total quantity
-    total_mgr = mgr_benefits.iloc[len(mgr_benefits.index)-1, 1:].sum()
+    total_mgr = totals.sum()
     return (shift_list, output, mgr_benefits, df_benefits, total_mgr)
 
-def output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, total_mgr, df_shift_merged, PAY_PERIOD):
+def style_cells(ws, cell_range, **styles):
+    '''
+    Set the same styles on every cell of a rectangular range of a worksheet (the range is parsed once).
+
+    ws -- an openpyxl worksheet
+    cell_range -- the range, e.g. "A3:I5"
+    styles -- the cell attributes to set, e.g. fill=FILL_GRAY
+    '''
+    for row in ws[cell_range]:
+        for cell in row:
+            for name, style in styles.items():
+                setattr(cell, name, style)
+
+def append_dataframe(ws, df):
+    '''
+    Write a dataframe to an empty openpyxl worksheet the way to_excel does (without the index),
+    appending whole rows instead of going through pandas' cell-by-cell writer.
+    The header is bold and boxed, missing values are empty cells and timestamps get a date-time format.
+
+    ws -- an empty openpyxl worksheet
+    df -- the pandas dataframe to write
+    '''
+    ws.append(list(df.columns))
+    for cell in ws[1]:
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+    for row in df.astype(object).where(df.notna(), "").itertuples(index=False, name=None):
+        ws.append(row)
+    for col_idx, dtype in enumerate(df.dtypes, start=1):
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            for (cell,) in ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx):
+                if cell.is_date:
+                    cell.number_format = "YYYY-MM-DD HH:MM:SS"
+
+def output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, total_mgr, shift_table, PAY_PERIOD):
     '''
     Output the invoice and return the underlying dataset
     '''
     save_path = save_path+"/"+f"INVOICE - {PAY_PERIOD}.xlsx"
-    # custom sort
-    for i in range(len(shift_list)):
-        shift_split = shift_list[i].split("-")
-        if len(shift_split) >= 2:
-            if shift_split[-1] == "Worked":
-                if shift_split[-2] != "Not":
-                    shift_list[i] = shift_list[i][:-7]
+    # custom sort: drop a trailing "-Worked" unless the shift is "...-Not-Worked"
+    shifts = pd.Series(shift_list, dtype=object)
+    worked = shifts.str.endswith("-Worked") & ~shifts.str.contains(r"(?:^|-)Not-Worked$")
+    shift_list = shifts.mask(worked, shifts.str[:-7]).tolist()
 
     #print(shift_list)
 
@@ -1739,21 +1908,21 @@ def output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, tot
     # billable = [_[2] for _ in output.values()]
     ####################################################################################################
 
-    shifts = output.keys()
-    hours = [_[0] for _ in output.values()]
-    rates = [_[1] for _ in output.values()]
-    billable = [_[2] for _ in output.values()]
-    BST_insurance_hrs = [_[3] for _ in output.values()]
-    BST_SARC_hrs = [_[4] for _ in output.values()]
-
-    df = pd.DataFrame({"Shifts": shifts, "Hours": hours, "Rates": rates, "Billable": billable,
-                    "BST_ins": BST_insurance_hrs, "BST_SARC": BST_SARC_hrs})
-    df["Shifts"] = df["Shifts"].astype(cat_size_order)
-    df = df.sort_values("Shifts")
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Invoice to send to GT"
+    df = output.rename(columns={"hours": "Hours", "rate": "Rates", "billable": "Billable",
+                                "bst_ins": "BST_ins", "bst_sarc": "BST_SARC"})
+    df = df.rename_axis("Shifts").reset_index()
+    # put the shifts in the custom order with a lookup instead of a sort;
+    # shifts missing from the order go last, without a name, as they would sort
+    known = df["Shifts"].isin(cat_size_order.categories)
+    present = set(df["Shifts"])
+    ordered = [shift for shift in cat_size_order.categories if shift in present]
+    df = pd.concat([df.set_index("Shifts").reindex(ordered).reset_index(),
+                    df[~known].assign(Shifts=np.nan)], ignore_index=True)
+
+    # all three sheets are built on the writer's workbook and saved once
+    writer = pd.ExcelWriter(save_path, engine='openpyxl')
+    wb = writer.book
+    ws = wb.create_sheet("Invoice to send to GT")
 
     # adjust column and row widths
     ws.column_dimensions['C'].width = 12
@@ -1851,32 +2020,33 @@ def output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, tot
     df = df.reset_index(drop=True)
     df.loc[len(df.index)] = ["","","","","",""]
     df.loc[len(df.index)] = ["Nova Leadership Costs", "", "", total_mgr, "", ""]
-    temp = df["Billable"].replace("", 0)
-    total = temp.sum()
+    # the blank separator cells count as nothing
+    total = pd.to_numeric(df["Billable"], errors="coerce").sum()
 
     fmt_acct = u'_($* #,##0.00_);[Red]_($* (#,##0.00);_($* -_0_0_);_(@'
-    ws.cell(row=11, column=7).fill = PatternFill(fgColor=Color("D9D9D9"), fill_type="solid")
-    ws.cell(row=11, column=9).fill = PatternFill(fgColor=Color("A6A6A6"), fill_type="solid")
+    ws.cell(row=11, column=7).fill = FILL_GRAY
+    ws.cell(row=11, column=9).fill = FILL_DARK_GRAY
 
-    for ind in df.index:
+    rows = zip(df["Shifts"].tolist(), df["Hours"].tolist(), df["BST_ins"].tolist(), df["BST_SARC"].tolist(),
+               df["Rates"].tolist(), df["Billable"].tolist())
+    for ind, (shift, hours, BST_ins, BST_SARC, rate, amount) in enumerate(rows):
+        row = 12 + ind
         if ind != len(df.index) - 2:
-            ws.cell(row=12+ind, column=2).value = 320
-        ws.cell(row=12+ind, column=3).value = df["Shifts"][ind]
-        ws.cell(row=12+ind, column=5).value = df["Hours"][ind]
+            ws.cell(row=row, column=2, value=320)
+        ws.cell(row=row, column=3, value=shift)
+        ws.cell(row=row, column=5, value=hours)
         # col 6 (F): BST/BCBA Hours Billed to Insurance
         #   # RBT hours paid as BST1, # RBT hours paid as BST2, etc.
-        ws.cell(row=12+ind, column=6).value = df["BST_ins"][ind]
+        ws.cell(row=row, column=6, value=BST_ins)
         # col 7 (G): Hours Billed to SARC
         #   deduct col 6 from original gross hours
-        ws.cell(row=12+ind, column=7).value = df["BST_SARC"][ind]
-        ws.cell(row=12+ind, column=7).fill = PatternFill(fgColor=Color("D9D9D9"), fill_type="solid")
+        ws.cell(row=row, column=7, value=BST_SARC).fill = FILL_GRAY
         # col 8 (H): same
-        ws.cell(row=12+ind, column=8).value = df["Rates"][ind]
-        ws.cell(row=12+ind, column=8).number_format = numbers.FORMAT_CURRENCY_USD_SIMPLE
+        ws.cell(row=row, column=8, value=rate).number_format = numbers.FORMAT_CURRENCY_USD_SIMPLE
         # col 9 (I): for BST, it is (col 7) * (col 8)
-        ws.cell(row=12+ind, column=9).value = df["Billable"][ind]
-        ws.cell(row=12+ind, column=9).number_format = fmt_acct
-        ws.cell(row=12+ind, column=9).fill = PatternFill(fgColor=Color("A6A6A6"), fill_type="solid")
+        cell = ws.cell(row=row, column=9, value=amount)
+        cell.number_format = fmt_acct
+        cell.fill = FILL_DARK_GRAY
 
     ws.cell(row=36, column=9).value = round(total, 2)
     ws.cell(row=36, column=9).number_format = numbers.FORMAT_CURRENCY_USD_SIMPLE
@@ -1899,76 +2069,48 @@ def output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, tot
 
     # fill colors
     # blue
-    ws["A2"].fill = PatternFill(fgColor=Color("9BC2E6"), fill_type="solid")
-    for col in "BCDEFGH":
-        ws[col+"2"].fill = PatternFill(fgColor=Color("9BC2E6"), fill_type="solid")
-        ws[col+"36"].fill = PatternFill(fgColor=Color("9BC2E6"), fill_type="solid")
-    ws["I36"].fill = PatternFill(fgColor=Color("9BC2E6"), fill_type="solid")
-    ws["A37"].fill = PatternFill(fgColor=Color("9BC2E6"), fill_type="solid")
+    ws["A2"].fill = FILL_BLUE
+    style_cells(ws, "B2:H2", fill=FILL_BLUE)
+    style_cells(ws, "B36:H36", fill=FILL_BLUE)
+    ws["I36"].fill = FILL_BLUE
+    ws["A37"].fill = FILL_BLUE
 
     # light gray
-    for row in range(3, 6):
-        for col in "ABCDEFGHI":
-            ws[col+str(row)].fill = PatternFill(fgColor=Color("F2F2F2"), fill_type="solid")
+    style_cells(ws, "A3:I5", fill=FILL_LIGHT_GRAY)
 
     # medium gray
-    ws["I2"].fill = PatternFill(fgColor=Color("F2F2F2"), fill_type="solid")
-    for row in range(6, 10):
-        for col in "ABCDEFGHI":
-            ws[col+str(row)].fill = PatternFill(fgColor=Color("D9D9D9"), fill_type="solid")
-    ws["G10"].fill = PatternFill(fgColor=Color("D9D9D9"), fill_type="solid")
-
-    # define border types
-    allBorder = Border(top = Side(border_style='thin', color='FF000000'),
-                    right = Side(border_style='thin', color='FF000000'),
-                    bottom = Side(border_style='thin', color='FF000000'),
-                    left = Side(border_style='thin', color='FF000000'))
-    topLeft = Border(top = Side(border_style='thin', color='FF000000'),
-                    left = Side(border_style='thin', color='FF000000'))
-    topRight = Border(top = Side(border_style='thin', color='FF000000'),
-                    right = Side(border_style='thin', color='FF000000'))
-    bottomLeft = Border(bottom = Side(border_style='thin', color='FF000000'),
-                        left = Side(border_style='thin', color='FF000000'))
-    bottomRight = Border(bottom = Side(border_style='thin', color='FF000000'),
-                        right = Side(border_style='thin', color='FF000000'))
-    top = Border(top = Side(border_style='thin', color='FF000000'))
-    right = Border(right = Side(border_style='thin', color='FF000000'))
-    bottom = Border(bottom = Side(border_style='thin', color='FF000000'))
-    left = Border(left = Side(border_style='thin', color='FF000000'))
+    ws["I2"].fill = FILL_LIGHT_GRAY
+    style_cells(ws, "A6:I9", fill=FILL_GRAY)
+    ws["G10"].fill = FILL_GRAY
 
     # border: drop down menu
-    for row in range(7, 9):
-        for col in "BCD":
-            ws[col+str(row)].border = allBorder
-    ws["A7"].border = topLeft
-    ws["A8"].border = bottomLeft
-    ws["E7"].border = top
-    ws["E8"].border = bottom
-    ws["F7"].border = top
-    ws["F8"].border = bottom
-    ws["G7"].border = topRight
-    ws["G8"].border = bottomRight
-    ws["A6"].border = topLeft
-    ws["I6"].border = topRight
-    ws["I9"].border = bottomRight
-    ws["A9"].border = bottomLeft
-    for col in "BCDEFGH":
-        ws[col+"6"].border = top
-        ws[col+"9"].border = bottom
-    ws["I7"].border = right
-    ws["I8"].border = right
+    style_cells(ws, "B7:D8", border=BORDER_ALL)
+    ws["A7"].border = BORDER_TOP_LEFT
+    ws["A8"].border = BORDER_BOTTOM_LEFT
+    ws["E7"].border = BORDER_TOP
+    ws["E8"].border = BORDER_BOTTOM
+    ws["F7"].border = BORDER_TOP
+    ws["F8"].border = BORDER_BOTTOM
+    ws["G7"].border = BORDER_TOP_RIGHT
+    ws["G8"].border = BORDER_BOTTOM_RIGHT
+    ws["A6"].border = BORDER_TOP_LEFT
+    ws["I6"].border = BORDER_TOP_RIGHT
+    ws["I9"].border = BORDER_BOTTOM_RIGHT
+    ws["A9"].border = BORDER_BOTTOM_LEFT
+    style_cells(ws, "B6:H6", border=BORDER_TOP)
+    style_cells(ws, "B9:H9", border=BORDER_BOTTOM)
+    ws["I7"].border = BORDER_RIGHT
+    ws["I8"].border = BORDER_RIGHT
 
     # border: header
-    ws["A2"].border = topLeft
-    ws["A3"].border = topLeft
-    ws["A4"].border = left
-    ws["A5"].border = left
-    ws["I3"].border = right
-    ws["I4"].border = right
-    ws["I5"].border = right
-    for col in "BCDEFG":
-        ws[col+"2"].border = top
-        ws[col+"3"].border = top
+    ws["A2"].border = BORDER_TOP_LEFT
+    ws["A3"].border = BORDER_TOP_LEFT
+    ws["A4"].border = BORDER_LEFT
+    ws["A5"].border = BORDER_LEFT
+    ws["I3"].border = BORDER_RIGHT
+    ws["I4"].border = BORDER_RIGHT
+    ws["I5"].border = BORDER_RIGHT
+    style_cells(ws, "B2:G3", border=BORDER_TOP)
     ws["H2"].border = Border(top = Side(border_style='medium', color='FF000000'),
                             right = Side(border_style='thin', color='FF000000'),
                             bottom = Side(border_style='medium', color='FF000000'),
@@ -1978,71 +2120,57 @@ def output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, tot
                             bottom = Side(border_style='medium', color='FF000000'))
 
     # border: main content
-    ws["B11"].border = topLeft
-    ws["H11"].border = topRight
-    ws["B35"].border = bottomLeft
-    ws["H35"].border = bottomRight
+    ws["B11"].border = BORDER_TOP_LEFT
+    ws["H11"].border = BORDER_TOP_RIGHT
+    ws["B35"].border = BORDER_BOTTOM_LEFT
+    ws["H35"].border = BORDER_BOTTOM_RIGHT
 
     # horizontal lines
-    for col in "CDEFG":
-        ws[col+"11"].border = top
-        ws[col+"35"].border = bottom
-        ws[col+"38"].border = bottom
-        ws[col+"40"].border = bottom
-    for col in "BCDEFGH":
-        ws[col+"36"].border = bottom
+    style_cells(ws, "C11:G11", border=BORDER_TOP)
+    for row in (35, 38, 40):
+        style_cells(ws, f"C{row}:G{row}", border=BORDER_BOTTOM)
+    style_cells(ws, "B36:H36", border=BORDER_BOTTOM)
 
     # vertical lines
-    ws["A10"].border = left
-    ws["A11"].border = left
-    ws["A35"].border = left
-    ws["A36"].border = left
-    ws["A37"].border = bottomLeft
-    ws["I10"].border = right
-    ws["I11"].border = topRight
-    ws["I35"].border = bottomRight
-    ws["I36"].border = bottomRight
-    for row in range(12, 35):
-        ws["A"+str(row)].border = left
-        ws["B"+str(row)].border = left
-        ws["H"+str(row)].border = right
-        ws["I"+str(row)].border = right
+    ws["A10"].border = BORDER_LEFT
+    ws["A11"].border = BORDER_LEFT
+    ws["A35"].border = BORDER_LEFT
+    ws["A36"].border = BORDER_LEFT
+    ws["A37"].border = BORDER_BOTTOM_LEFT
+    ws["I10"].border = BORDER_RIGHT
+    ws["I11"].border = BORDER_TOP_RIGHT
+    ws["I35"].border = BORDER_BOTTOM_RIGHT
+    ws["I36"].border = BORDER_BOTTOM_RIGHT
+    style_cells(ws, "A12:B34", border=BORDER_LEFT)
+    style_cells(ws, "H12:I34", border=BORDER_RIGHT)
 
     # font
     ws['E2'].font = Font(name="Aparajita", size=24)
-    for row in range(3, 6):
-        for col in "AG":
-            ws[col+str(row)].font = Font(name="Aparajita", size=14, bold=True)
-        for col in "BCDEF":
-            ws[col+str(row)].font = Font(name="Aparajita", size=14)
-    ws['A7'].font = Font(name="Aparajita", size=14, bold=True)
-    ws['A8'].font = Font(name="Aparajita", size=14, bold=True)
-    ws['B7'].font = Font(name="Aparajita", size=14, bold=True)
-    ws['B8'].font = Font(name="Aparajita", size=14)
-    ws['C7'].font = Font(name="Aparajita", size=14, bold=True)
-    ws['C8'].font = Font(name="Aparajita", size=14)
-    ws['D7'].font = Font(name="Aparajita", size=14, bold=True)
-    ws['D8'].font = Font(name="Aparajita", size=14)
-
-    for row in range(12, 36):
-        for col in "BCDEFGH":
-            ws[col+str(row)].font = Font(name="Aparajita", size=14)
+    style_cells(ws, "A3:A5", font=FONT_APARAJITA_14_BOLD)
+    style_cells(ws, "G3:G5", font=FONT_APARAJITA_14_BOLD)
+    style_cells(ws, "B3:F5", font=FONT_APARAJITA_14)
+    ws['A7'].font = FONT_APARAJITA_14_BOLD
+    ws['A8'].font = FONT_APARAJITA_14_BOLD
+    ws['B7'].font = FONT_APARAJITA_14_BOLD
+    ws['B8'].font = FONT_APARAJITA_14
+    ws['C7'].font = FONT_APARAJITA_14_BOLD
+    ws['C8'].font = FONT_APARAJITA_14
+    ws['D7'].font = FONT_APARAJITA_14_BOLD
+    ws['D8'].font = FONT_APARAJITA_14
+
+    style_cells(ws, "B12:H35", font=FONT_APARAJITA_14)
 
     # row 10: bold from A to I
-    for col in "ABCDEFGHI":
-        ws[col+"10"].font = Font(name="Aparajita", bold=True)
+    style_cells(ws, "A10:I10", font=FONT_APARAJITA_BOLD)
     # row 11: bold in A; apply font from B to I
-    ws["A11"].font = Font(name="Aparajita", bold=True)
-    for col in "BCDEFGHI":
-        ws[col+"11"].font = Font(name="Aparajita")
+    ws["A11"].font = FONT_APARAJITA_BOLD
+    style_cells(ws, "B11:I11", font=FONT_APARAJITA)
     # A12: bold
-    ws["A12"].font = Font(name="Aparajita", bold=True)
+    ws["A12"].font = FONT_APARAJITA_BOLD
     # col A, rows 13-36: apply font
-    for row in range(13, 37):
-        ws["A"+str(row)].font = Font(name="Aparajita")
+    style_cells(ws, "A13:A36", font=FONT_APARAJITA)
     # row 36, col B to H: apply font
-    for col in "CDEFGH":
-        ws[col+"36"].font = Font(name="Aparajita")
+    style_cells(ws, "C36:H36", font=FONT_APARAJITA)
     # I36: font size 16
     ws["I36"].font = Font(name="Aparajita", size=16)
     ws["C6"].font = Font(size=8)
@@ -2051,51 +2179,27 @@ def output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, tot
     ws["H5"].font = Font(size=12)
     ws["C38"].font = Font(name="Brush Script MT", size=14)
     ws["C40"].font = Font(name="Brush Script MT", size=14)
-    wb.save(save_path)
-    wb.close()
-
-    book = load_workbook(save_path)
-    writer = pd.ExcelWriter(save_path, engine='openpyxl') 
-    writer.book = book
 
     df_benefits.to_excel(writer, "Nova Leadership Cost Breakdowns", index=False)
 
-    df_shift_merged['Holiday Worked Duration (Hours)'] = (df_shift_merged['Holiday Worked Duration (Minutes)']/60).round(2)
-    df_shift_merged['Hrs. Worked'] = df_shift_merged['Min. Worked']/60
-    df_shift_merged = df_shift_merged.round(decimals=2)
-    df_shift_merged['Day of the Week'] = df_shift_merged['CIDT'].dt.day_name()
-    df_shift_merged = df_shift_merged[['Name', 'First Name', 'Last Name', 'Shift_original', 'Shift','Day of the Week', 'Check-In Date', 
-                                       'Check-In Time', 'Check-Out Date', 'Check-Out Time', 'Min. Worked', 'Hrs. Worked',  'Regular Hourly Wage', 
-                                       'BOT Hourly Wage', 'Accrual Rate', 'CIDT', 'CODT','Holiday Worked Duration (Minutes)',
-                                       'Holiday Worked Duration (Hours)']]
-    df_shift_merged = df_shift_merged.reindex(columns=['Name', 'First Name', 'Last Name', 'Shift_original', 'Shift','Day of the Week', 'Check-In Date', 
-                                                       'Check-In Time', 'Check-Out Date', 'Check-Out Time', 'Min. Worked', 'Hrs. Worked',  
-                                                       'Regular Hourly Wage', 'BOT Hourly Wage', 'Accrual Rate', 'CIDT', 
-                                                       'CODT','Holiday Worked Duration (Minutes)','Holiday Worked Duration (Hours)'])
-    df_shift_merged.to_excel(writer, "Shift Breakdowns", index=False)
-
-    writer.save()
-
-    wb = load_workbook(save_path)
+    # the shift breakdowns can run to thousands of rows, so they are appended row by row
+    ws2 = wb.create_sheet("Shift Breakdowns")
+    append_dataframe(ws2, shift_table)
+
     ws1 = wb["Nova Leadership Cost Breakdowns"]
     ws1.cell(row=len(df_benefits.index)+4, column=1).value = "MANAGERS' TOTAL WAGES & BENEFITS"
     ws1.cell(row=len(df_benefits.index)+5, column=1).value = total_mgr
     ws1.cell(row=len(df_benefits.index)+4, column=1).font = Font(bold=True)
-    for column_cells in ws1.columns:
-        new_column_length = max(len(str(cell.value)) for cell in column_cells)
-        new_column_letter = (get_column_letter(column_cells[0].column))
-        if new_column_length > 0:
-            ws1.column_dimensions[new_column_letter].width = new_column_length*1.23
-
-    ws2 = wb["Shift Breakdowns"]
-    for column_cells in ws2.columns:
-        new_column_length = max(len(str(cell.value)) for cell in column_cells)
-        new_column_letter = (get_column_letter(column_cells[0].column))
-        if new_column_length > 0:
-            ws2.column_dimensions[new_column_letter].width = new_column_length*1.23
-
-    wb.save(save_path)
-    wb.close()
+    # column widths come from the dataframes rather than the written cells
+    benefits_widths = cell_text_lengths(df_benefits)
+    benefits_widths[0] = max(benefits_widths[0], len("MANAGERS' TOTAL WAGES & BENEFITS"), len(str(total_mgr)))
+    for col_idx, column_length in enumerate(benefits_widths, start=1):
+        ws1.column_dimensions[get_column_letter(col_idx)].width = column_length*1.23
+
+    for col_idx, column_length in enumerate(cell_text_lengths(shift_table), start=1):
+        ws2.column_dimensions[get_column_letter(col_idx)].width = column_length*1.23
+
+    writer.close()
     # return the underlying dataset.
     return df
 
@@ -2113,17 +2217,21 @@ def output_underlying(mgr_pr, non_mgr_pr, invoice_df, save_path, PAY_PERIOD, FUL
                                     'Hrs. YTD', 'Hrs. Worked This Period','Hire Date', 'Calendar Days Since Hire Date', 
                                     'Vac. Accrued YTD','Vac. Taken YTD', 'Vac. Accrued This Period', 'Vac. Taken This Period',
                                     'Vac. Balance', 'Sick Bank YTD', 'Sick Taken YTD','Sick Taken This Period', 'Sick Balance'])
-    #flatten in a loop
+    #flatten in a loop (the pieces are concatenated once at the end)
+    pieces = []
     for pack in [*mgr_pr, *non_mgr_pr]:
         payroll = pack['payroll']
         if len(payroll) == 0:
             continue
-        summary =  pd.concat([pack['summary']] * len(payroll), ignore_index=True)
-        acc_A = pd.concat([pack['accrued_A']] * len(payroll), ignore_index=True)
-        acc_B = pd.concat([pack['accrued_B']] * len(payroll), ignore_index=True)
-        acc_C = pd.concat([pack['accrued_C']] * len(payroll), ignore_index=True)
+        # the one-row tables are repeated for every payroll row
+        first_row = np.zeros(len(payroll), dtype=np.intp)
+        summary = pack['summary'].iloc[first_row].reset_index(drop=True)
+        acc_A = pack['accrued_A'].iloc[first_row].reset_index(drop=True)
+        acc_B = pack['accrued_B'].iloc[first_row].reset_index(drop=True)
+        acc_C = pack['accrued_C'].iloc[first_row].reset_index(drop=True)
         flattened = pd.concat([payroll, summary, acc_A, acc_B, acc_C], axis=1)
-        noumenon = pd.concat([noumenon, flattened], axis=0, ignore_index=True)
+        pieces.append(flattened)
+    noumenon = pd.concat([noumenon, *pieces], axis=0, ignore_index=True)
     #save file
     if FULL_CYCLE:
         #drop manager only column
@@ -2138,13 +2246,157 @@ def output_underlying(mgr_pr, non_mgr_pr, invoice_df, save_path, PAY_PERIOD, FUL
                                                 "Billable": "SARC_Billed_Amt",
                                                 "BST_ins": "Ins_Billed_Hrs",
                                                 "BST_SARC": "SARC_Billed_Hrs"})
-        with pd.ExcelWriter(save_path + "/" + f"MACHINE_READABLE_OUTPUT - {PAY_PERIOD}.xlsx") as writer:
-            # Write each dataframe to a separate tab
-            noumenon.to_excel(writer, sheet_name='Payroll', index=False)
+    with pd.ExcelWriter(save_path + "/" + f"MACHINE_READABLE_OUTPUT - {PAY_PERIOD}.xlsx", engine='xlsxwriter') as writer:
+        # Write each dataframe to a separate tab
+        noumenon.to_excel(writer, sheet_name='Payroll', index=False)
+        if FULL_CYCLE:
             invoice_df.to_excel(writer, sheet_name='Invoice', index=False)
-    else:
-        with pd.ExcelWriter(save_path + "/" + f"MACHINE_READABLE_OUTPUT - {PAY_PERIOD}.xlsx") as writer:
-            noumenon.to_excel(writer, sheet_name='Payroll', index=False)
+
+
+def report_progress(progress, stage, pct):
+    '''
+    Report the stage a running pipeline has reached.
+
+    progress -- a queue-like object with a put() method, or None to skip reporting
+    stage -- name of the stage that is starting
+    pct -- rough percentage of the pipeline completed
+    '''
+    if progress is not None:
+        progress.put({"stage": stage, "pct": pct})
+
+@contextlib.contextmanager
+def timed_stage(progress, timings, stage, pct):
+    '''
+    Report a pipeline stage and record how long it ran.
+
+    progress -- a queue-like object with a put() method, or None to skip reporting
+    timings -- list the (stage, nanoseconds) pair is appended to
+    stage -- name of the stage
+    pct -- rough percentage of the pipeline completed when the stage starts
+    '''
+    report_progress(progress, stage, pct)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        timings.append((stage, time.perf_counter_ns() - start))
+
+def stage_timings(timings):
+    '''
+    Convert recorded (stage, nanoseconds) pairs to a JSON-friendly list in milliseconds.
+    '''
+    return [{"stage": stage, "ms": round(ns / 1e6, 3)} for stage, ns in timings]
+
+def run_cycle(shift_record_path, tracker_path, save_path, progress=None):
+    '''
+    Process the payroll for the whole cycle and write all output files to save_path.
+
+    shift_record_path -- path to the shift record
+    tracker_path -- path to the old tracker
+    save_path -- folder for the processed files
+    progress -- optional queue receiving a message at the start of each stage
+
+    return a dictionary with the status message, the names of the files produced, and the time spent in each stage.
+    '''
+    timings = []
+    #remove old files
+    delete_files_in_folder(save_path)
+    #read shift record and check for errors
+    with timed_stage(progress, timings, "read_shift_record", 0):
+        df, PAY_PERIOD, start_date, end_date = read_shift_record(shift_record_path)
+    #read old tracker adn check for errors
+    with timed_stage(progress, timings, "read_old_tracker", 10):
+        manager_rates, non_manager_rates, accrued_hrs, bonus_df, bonus, original_bonus_df, staff_info, prepaid_last_time, unpaid_last_time = read_old_tracker(tracker_path, start_date)
+    # format unpaid_last)time, with the shift record's dtypes so the concat does not upcast columns to object
+    unpaid_last_time = unpaid_last_time[df.columns].astype(df.dtypes.to_dict())
+    #append overight shifts unpaid last time with df
+    df = pd.concat([df, unpaid_last_time], ignore_index=True)
+    #merge shift record with pay rates from the tracker
+    with timed_stage(progress, timings, "merge_shifts", 20):
+        df_shift_merged = merge_shifts(df, staff_info, manager_rates, non_manager_rates)
+    # calculate worked holidays
+    with timed_stage(progress, timings, "calc_worked_holiday", 30):
+        df_shift_merged = calc_worked_holiday(df_shift_merged)
+    #calculate vacation and sick times
+    with timed_stage(progress, timings, "calc_time_off", 35):
+        df_shift_merged, time_off, time_off_as_shifts = calc_time_off(df_shift_merged)
+    #crop the shift record based on pay cycle
+    with timed_stage(progress, timings, "crop_shifts", 40):
+        df_shift_merged, df_after_pay_period, prepaid_hours, week_order, PREPAY = crop_shifts(df_shift_merged, start_date, end_date)
+    #generate payroll outputs
+    with timed_stage(progress, timings, "generate_payroll", 45):
+        non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs = generate_payroll(df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, manager_rates, staff_info, prepaid_last_time, PAY_PERIOD, week_order, PREPAY)
+    #output payroll files on a second thread while the invoice is built;
+    #it gets its own copies of the frames it modifies
+    report_progress(progress, "output_payroll_files", 60)
+    #the shift breakdowns written to both the payroll and the invoice files (read only from here on)
+    shift_table = shift_breakdown_table(df_shift_merged)
+    def write_payroll_files(manager_rates):
+        # the stage is reported above, so the progress stays in order
+        with timed_stage(None, timings, "output_payroll_files", 60):
+            output_payroll_files(save_path, shift_table, staff_info, non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs, original_bonus_df, time_off_as_shifts, non_manager_rates, manager_rates, prepaid_hours, df_after_pay_period, PAY_PERIOD)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        payroll_files = pool.submit(write_payroll_files, manager_rates.copy())
+        #the invoice is built from the manager info as written to the new tracker
+        clear_manager_entries(manager_rates)
+        #generate invoice outputs
+        with timed_stage(progress, timings, "generate_invoice", 75):
+            shift_list, output, mgr_benefits, df_benefits, total_mgr = generate_invoice(df_shift_merged, manager_rates, non_manager_rates, staff_info, non_mgr_pr, mgr_pr)
+        #output invoice file
+        with timed_stage(progress, timings, "output_invoice", 80):
+            invoice_df = output_invoice(save_path, shift_list, output, mgr_benefits, df_benefits, total_mgr, shift_table, PAY_PERIOD)
+        #output machine_readable payroll
+        with timed_stage(progress, timings, "output_underlying", 90):
+            output_underlying(mgr_pr, non_mgr_pr, invoice_df, save_path, PAY_PERIOD, True)
+        payroll_files.result()
+    file_names = list_files(save_path)
+    return {"status": "success", "message": "Files Processed Successfully!", "files": file_names, "timings": stage_timings(timings)}
+
+def run_one(shift_record_path, tracker_path, save_path, selected_name, progress=None):
+    '''
+    Process an off-cycle payroll for one staff and write the output files to save_path.
+
+    shift_record_path -- path to the shift record
+    tracker_path -- path to the old tracker
+    save_path -- folder for the processed files
+    selected_name -- full name of the staff ("First Last")
+    progress -- optional queue receiving a message at the start of each stage
+
+    return a dictionary with the status message, the names of the files produced, and the time spent in each stage.
+    '''
+    timings = []
+    delete_files_in_folder(save_path)
+    with timed_stage(progress, timings, "read_shift_record", 0):
+        df, PAY_PERIOD, start_date, end_date = read_one_person_record(shift_record_path, selected_name)
+    #read old tracker adn check for errors
+    with timed_stage(progress, timings, "read_old_tracker", 10):
+        manager_rates, non_manager_rates, accrued_hrs, bonus_df, bonus, original_bonus_df, staff_info, prepaid_last_time, unpaid_last_time = read_old_tracker(tracker_path, start_date)
+    #only the selected staff's shifts unpaid last time are carried over
+    unpaid_last_time = unpaid_last_time.loc[unpaid_last_time['Name'] == selected_name, df.columns].astype(df.dtypes.to_dict())
+    #append overight shifts unpaid last time with df
+    df = pd.concat([df, unpaid_last_time], ignore_index=True)
+    #merge shift record with pay rates from the tracker
+    with timed_stage(progress, timings, "merge_shifts", 20):
+        df_shift_merged = merge_shifts(df, staff_info, manager_rates, non_manager_rates)
+    # calculate worked holidays
+    with timed_stage(progress, timings, "calc_worked_holiday", 30):
+        df_shift_merged = calc_worked_holiday(df_shift_merged)
+    with timed_stage(progress, timings, "calc_time_off", 40):
+        df_shift_merged, time_off, time_off_as_shifts = calc_time_off(df_shift_merged)
+    #crop the shift record based on pay cycle
+    with timed_stage(progress, timings, "crop_shifts", 50):
+        df_shift_merged, df_after_pay_period, prepaid_hours, week_order, PREPAY = crop_shifts(df_shift_merged, start_date, end_date)
+    #generate payroll outputs
+    df_shift_merged = df_shift_merged.loc[df_shift_merged['Name'] == selected_name]
+    with timed_stage(progress, timings, "generate_payroll", 60):
+        non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, new_accrued_hrs = generate_payroll(df_shift_merged, accrued_hrs, bonus_df, bonus, time_off, manager_rates, staff_info, prepaid_last_time, PAY_PERIOD, week_order, PREPAY)
+    #output payroll files
+    with timed_stage(progress, timings, "output_payroll_for_one", 80):
+        output_payroll_for_one(selected_name, save_path, shift_breakdown_table(df_shift_merged), non_mgr_pr, mgr_pr, non_mgr_bkd, mgr_bkd, time_off_as_shifts, PAY_PERIOD)
+    with timed_stage(progress, timings, "output_underlying", 90):
+        output_underlying(mgr_pr, non_mgr_pr, {}, save_path, PAY_PERIOD, False)
+    file_names = list_files(save_path)
+    return {"status": "success", "message": f"File Processed Successfully for {selected_name}", "files": file_names, "timings": stage_timings(timings)}
 
 
 # Copyright (c) [2023] [Nova Home Support LLC]
@@ -0,0 +1,12 @@
+import pandas as pd
+
+from helpers import weekly_overtime_by_name
+
+
+def test_weekly_overtime_by_name_without_shifts():
+    # B has no shift in the period (e.g. only a bonus or time off)
+    df = pd.DataFrame({'Name': ['A'], 'Shift': ['HSS1-Worked'], 'Min. Worked': [600],
+                       'BOT Hourly Wage': [20.0], 'CIDT': pd.to_datetime(['2024-01-01 08:00'])})
+    overtime = weekly_overtime_by_name(df, ['B'], pd.DataFrame(), '2024-01-01')
+    assert overtime.empty
+    assert list(overtime.columns) == ['Name', 'Week', 'Overtime Hours', 'OT Rate']
@@ -0,0 +1,10 @@
+'''
+Nova Payroll Processor
+filename: wsgi.py
+This file exposes the app to a production WSGI server, e.g.
+gunicorn --preload --workers 1 --threads 8 --timeout 600 wsgi:app
+'''
+from app import app
+
+# Copyright (c) [2023] [Nova Home Support LLC]
+# This code is licensed under the Creative Commons Attribution-NonCommercial 4.0 International License. See LICENSE.md for details.